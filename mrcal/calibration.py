@@ -153,14 +153,14 @@ which mrcal.optimize() expects
     import shutil
     from tempfile import mkstemp
     import io
-    import copy
 
     def get_corner_observations(W, H, globs_per_camera, corners_cache_vnl, exclude_images=set()):
         r'''Return dot observations, from a cache or from mrgingham
 
-        Returns a dict mapping from filename to a numpy array with a full grid
-        of dot observations. If no grid was observed in a particular image, the
-        relevant dict entry is empty
+        Returns a dict mapping from filename to an index into an array of
+        full-grid dot observations, and that array. The array has shape
+        (N,H,W,3). If no grid was observed in a particular image, the relevant
+        dict entry is empty
 
         The corners_cache_vnl argument is for caching corner-finder results.
         This can be None if we want to ignore this. Otherwise, this is treated
@@ -256,134 +256,202 @@ which mrcal.optimize() expects
 
 
         mapping = {}
-        context0 = dict(f            = '',
-                        igrid        = 0,
-                        Nvalidpoints = 0)
-
-        # Init the array to -1.0: everything is invalid
-        context0['grid'] = -np.ones( (H*W,3), dtype=float)
-
-        context = copy.deepcopy(context0)
 
         # relative-path globs_per_camera: add explicit "*/" to the start
         globs_per_camera = [g if g[0]=='/' else '*/'+g for g in globs_per_camera]
 
-        def finish_chessboard_observation():
-            nonlocal context
-
-            def accum_files(f):
-                for icam in range(Ncameras):
-                    if fnmatch.fnmatch(os.path.abspath(f), globs_per_camera[icam]):
-                        files_per_camera[icam].append(f)
-                        return True
-                return False
-
-            if context['igrid'] > 1:
-                if W*H != context['igrid']:
-                    raise Exception("File '{}' expected to have {} points, but got {}". \
-                                    format(context['f'], W*H, context['igrid']))
-                if context['f'] not in exclude_images and \
-                   context['Nvalidpoints'] > 3:
-                    # There is a bit of ambiguity here. The image path stored in
-                    # the 'corners_cache_vnl' file is relative to what? It could be
-                    # relative to the directory the corners_cache_vnl lives in, or it
-                    # could be relative to the current directory. The image
-                    # doesn't necessarily need to exist. I implement a few
-                    # heuristics to figure this out
-                    if corners_dir is None          or \
-                       context['f'][0] == '/'       or \
-                       os.path.exists(context['f']):
-                        filename_canonical = os.path.normpath(context['f'])
-                    else:
-                        filename_canonical = os.path.join(corners_dir, context['f'])
-                    if accum_files(filename_canonical):
-                        mapping[filename_canonical] = context['grid'].reshape(H,W,3)
-
-            context = copy.deepcopy(context0)
-
-        for line in pipe_corners_read:
-            if pipe_corners_write_fd is not None:
-                os.write(pipe_corners_write_fd, line.encode())
+        # I match each image path against each glob. I compile the globs once
+        # here instead of having fnmatch look them up every time
+        match_per_camera = [re.compile(fnmatch.translate(g)).match \
+                            for g in globs_per_camera]
 
-            if re.match(r'\s*#', line):
-                continue
-            m = re.match(r'\s*(\S+)\s+(.*?)$', line)
-            if m is None:
-                raise Exception(f"Unexpected line in the corners output: '{line}'")
-            if context['f'] != m.group(1):
-                # Got data for the next image. Finish out this one
-                finish_chessboard_observation()
-                context['f'] = m.group(1)
-
-            # The row may have 2 or 3 values: if 3, it contains a decimation
-            # level of the corner observation (used for the weight). If 2, a
-            # weight of 1.0 is assumed. The weight array is pre-filled with 1.0.
-            # A decimation level of - will be used to set weight <0 which means
-            # "ignore this point"
-            fields = m.group(2).split()
-            if not (len(fields) == 2 or len(fields) == 3):
-                raise Exception(f"'corners.vnl' data rows must contain a filename and 2 or 3 values. Instead got line '{line}'")
-
-
-            def parse_point(out, fields):
-                r'''Parse the given split-string fields
-
-                Write results into out[:]. Return True if the given point is
-                valid. The initial value of out[:] is (-1,-1,-1): "invalid"
-
-                '''
-                if fields[0] == '-' or fields[1] == '-':
-                    # out[:] already is invalid
-                    return False
-
-                try:
-                    out[0] = float(fields[0])
-                    out[1] = float(fields[1])
-                except:
-                    raise Exception(f"'corners.vnl' data rows must lead with 'filename x y' with x and y being numerical or '-'. Instead got line '{line}'")
-
-                if out[0] < 0 or out[1] < 0:
-                    # out[:] already is invalid
-                    return False
-
-                if len(fields) == 2 or weight_column_kind is None:
-                    # default weight
-                    out[2] = 1.0
+        def accum_files(f):
+            for icam in range(Ncameras):
+                if match_per_camera[icam](os.path.abspath(f)):
+                    files_per_camera[icam].append(f)
                     return True
-
-                if fields[2] == '-':
-                    # out[:] already is invalid
-                    return False
-
-                try:
-                    w = float(fields[2])
-                except:
-                    raise Exception(f"'corners.vnl' data rows expected as 'filename x y {weight_column_kind}' with {weight_column_kind} being numerical or '-'. Instead got line '{line}'")
+            return False
+
+        def strings_to_float(s, irows, error):
+            r'''Convert an array of strings to floats
+
+            Raises an exception containing the offending line if any of the
+            strings isn't a number. irows are the indices of the rows of s in
+            the lines[] list
+
+            '''
+            try:
+                return s.astype(float)
+            except:
+                for i in range(len(s)):
+                    try:
+                        s[i].astype(float)
+                    except:
+                        raise Exception(error(lines[irows[i]]))
+                raise
+
+        def parse_points():
+            r'''Parse the numerical data in all the rows at once
+
+            Returns an array of shape (Nrows,3). Each row is (x,y,weight).
+            Invalid points have weight = -1. If x or y is '-', the whole row is
+            (-1,-1,-1)
+
+            '''
+            Nrows = len(fields)
+
+            # Init the array to -1.0: everything is invalid
+            xyw = -np.ones( (Nrows,3), dtype=float)
+            if Nrows == 0:
+                return xyw
+
+            # shape (Nrows,3). The last column is '' if the row doesn't have it
+            xyw_strings = np.array([f if len(f) == 3 else f + [''] for f in fields],
+                                   dtype=str)
+            xy_strings  = xyw_strings[:,:2]
+
+            # I convert all the numerical columns with one astype() call. The
+            # '-' and missing values are placeholders, and I don't use them. If
+            # anything fails to convert, I convert the columns separately
+            # below, to report the offending line
+            numerical_strings = np.where((xyw_strings == '-') | (xyw_strings == ''),
+                                         '0', xyw_strings)
+            if weight_column_kind is None:
+                numerical_strings[:,2] = '0'
+            try:
+                values = numerical_strings.astype(float)
+            except:
+                values = None
+
+            # A '-' in x or y means "not detected"
+            i = np.flatnonzero(np.all(xy_strings != '-', axis=-1))
+            if values is not None:
+                xy = values[i,:2]
+            else:
+                xy = strings_to_float(xy_strings[i], i,
+                                      lambda line: f"'corners.vnl' data rows must lead with 'filename x y' with x and y being numerical or '-'. Instead got line '{line}'")
+
+            keep = np.all(xy >= 0, axis=-1)
+            w    = np.ones( (len(i),), dtype=float)
+
+            if weight_column_kind is not None:
+                # The rows without an extra column get the default weight of
+                # 1.0. I only look at the extra column in rows that are
+                # otherwise valid
+                k = np.flatnonzero(keep & (xyw_strings[i,2] != ''))
+                w_strings = xyw_strings[i[k],2]
+
+                # A '-' means "not detected"
+                mask_dash       = w_strings == '-'
+                keep[k[mask_dash]] = False
+                k               = k        [~mask_dash]
+                w_strings       = w_strings[~mask_dash]
+
+                if values is not None:
+                    wk = values[i[k],2]
+                else:
+                    wk = strings_to_float(w_strings, i[k],
+                                          lambda line: f"'corners.vnl' data rows expected as 'filename x y {weight_column_kind}' with {weight_column_kind} being numerical or '-'. Instead got line '{line}'")
 
                 if weight_column_kind == 'weight':
-                    if w <= 0.0:
-                        # out[:] already is invalid
-                        return False
-                    out[2] = w
+                    keep[k[wk <= 0.0]] = False
+                    w[k] = wk
                 else:
-                    if w < 0.0:
-                        # out[:] already is invalid
-                        return False
+                    keep[k[wk < 0.0]] = False
                     # convert decimation level to weight. The weight is
                     # 2^(-level). I.e. level-0 -> weight=1, level-1 ->
                     # weight=0.5, etc
-                    out[2] = 1. / (1 << int(w))
-
-                return True
-
-
-            if parse_point(context['grid'][context['igrid'],:],
-                              fields):
-                context['Nvalidpoints'] += 1
-
-            context['igrid'] += 1
+                    w[k] = np.ldexp(1., -np.maximum(wk,0).astype(int))
+
+            # Points with numerical x,y keep them even if they are invalid. The
+            # weight<0 marks them as such
+            xyw[i,      :2] = xy
+            xyw[i[keep], 2] = w[keep]
+            return xyw
+
+        # I read all the rows, and then parse the numerical data all at once.
+        # The whole stream is slurped in one call, and the cache is written
+        # with one call as well
+        corners_text = pipe_corners_read.read()
+        if pipe_corners_write_fd is not None:
+            os.write(pipe_corners_write_fd, corners_text.encode())
+
+        # A plain whitespace split is much faster than matching a regex for
+        # each line
+        lines  = corners_text.splitlines(keepends=True)
+        tokens = [line.split() for line in lines]
+
+        # I classify all the lines at once. Comments are skipped, and
+        # everything else must be a data row.
+        #
+        # The row may have 2 or 3 values: if 3, it contains a decimation level
+        # or a weight of the corner observation. If 2, a weight of 1.0 is
+        # assumed. A '-' will be used to set weight <0 which means "ignore this
+        # point"
+        Ntokens    = np.array([len(t) for t in tokens], dtype=int)
+        is_comment = np.array([len(t) > 0 and t[0][0] == '#' for t in tokens], dtype=bool)
+        ibad = np.flatnonzero( ~is_comment & (Ntokens != 3) & (Ntokens != 4) )
+        if len(ibad):
+            line = lines[ibad[0]]
+            if Ntokens[ibad[0]] == 0:
+                raise Exception(f"Unexpected line in the corners output: '{line}'")
+            raise Exception(f"'corners.vnl' data rows must contain a filename and 2 or 3 values. Instead got line '{line}'")
+
+        idata     = np.flatnonzero(~is_comment)
+        lines     = [lines [i]     for i in idata]
+        filenames = [tokens[i][0]  for i in idata]
+        fields    = [tokens[i][1:] for i in idata]
+
+        # shape (Nrows,3)
+        xyw = parse_points()
+
+        # Each contiguous run of rows with the same filename is one chessboard
+        # observation
+        filenames = np.array(filenames, dtype=str)
+        irun0 = np.flatnonzero( np.concatenate(( (True,),
+                                                 filenames[1:] != filenames[:-1] )) ) \
+                if len(filenames) else np.array((), dtype=int)
+        irun1 = np.concatenate(( irun0[1:], (len(filenames),) ))
+
+        Nrows_run = irun1 - irun0
+
+        # Valid points have weight > 0
+        Nvalidpoints_run = \
+            np.add.reduceat((xyw[:,2] > 0).astype(int), irun0) \
+            if len(irun0) else irun0
+
+        # A single row means the chessboard wasn't found in that image. Any
+        # other image must have ALL the points in the grid
+        ibad = np.flatnonzero( (Nrows_run > 1) & (Nrows_run != W*H) )
+        if len(ibad):
+            raise Exception("File '{}' expected to have {} points, but got {}". \
+                            format(filenames[irun0[ibad[0]]], W*H, Nrows_run[ibad[0]]))
+
+        # I only use the images with enough valid points. Each of those has
+        # exactly W*H rows, so I gather them all into one (N,H,W,3) array
+        iuse = np.flatnonzero( (Nrows_run > 1) & (Nvalidpoints_run > 3) )
+        xyw_use = \
+            xyw[ nps.dummy(irun0[iuse],-1) + np.arange(W*H) ].reshape(len(iuse),H,W,3)
+
+        for irun,i0 in enumerate(irun0[iuse]):
+            f = str(filenames[i0])
+            if f in exclude_images:
+                continue
 
-        finish_chessboard_observation()
+            # There is a bit of ambiguity here. The image path stored in
+            # the 'corners_cache_vnl' file is relative to what? It could be
+            # relative to the directory the corners_cache_vnl lives in, or it
+            # could be relative to the current directory. The image
+            # doesn't necessarily need to exist. I implement a few
+            # heuristics to figure this out
+            if corners_dir is None or \
+               f[0] == '/'         or \
+               os.path.exists(f):
+                filename_canonical = os.path.normpath(f)
+            else:
+                filename_canonical = os.path.join(corners_dir, f)
+            if accum_files(filename_canonical):
+                mapping[filename_canonical] = irun
 
         if corners_output is not None:
             sys.stderr.write("Done computing chessboard corners\n")
@@ -422,44 +490,51 @@ which mrcal.optimize() expects
                 raise Exception("Found too few ({}; need at least {}) images containing a calibration pattern in camera {}; glob '{}'". \
                                 format(N, min_num_images, icam, globs_per_camera[icam]))
 
-        return mapping,files_per_camera
+        return mapping,files_per_camera,xyw_use
 
 
-    indices_frame_camera = np.array((), dtype=np.int32)
-    observations         = np.array((), dtype=float)
-
     # basic logic is this:
     #   for frames:
     #       for cameras:
     #           if have observation:
     #               push observations
     #               push indices_frame_camera
-    mapping_file_corners,files_per_camera = get_corner_observations(W, H, globs_per_camera, corners_cache_vnl, exclude_images)
+    mapping_file_corners,files_per_camera,observations_all = \
+        get_corner_observations(W, H, globs_per_camera, corners_cache_vnl, exclude_images)
     file_framenocameraindex               = mrcal.mapping_file_framenocameraindex(*files_per_camera)
 
     # I create a file list sorted by frame and then camera. So my for(frames)
-    # {for(cameras) {}} loop will just end up looking at these files in order
-    files_sorted = sorted(mapping_file_corners.keys(), key=lambda f: file_framenocameraindex[f][1])
-    files_sorted = sorted(files_sorted,                key=lambda f: file_framenocameraindex[f][0])
-
-    i_observation = 0
-
-    iframe_last = None
-    index_frame  = -1
-    for f in files_sorted:
-        # The frame indices I return are consecutive starting from 0, NOT the
-        # original frame numbers
-        iframe,icam = file_framenocameraindex[f]
-        if iframe_last == None or iframe_last != iframe:
-            index_frame += 1
-            iframe_last = iframe
-
-        indices_frame_camera = nps.glue(indices_frame_camera,
-                                        np.array((index_frame, icam), dtype=np.int32),
-                                        axis=-2)
-        observations = nps.glue(observations,
-                                mapping_file_corners[f],
-                                axis=-4)
+    # {for(cameras) {}} loop will just end up looking at these files in order.
+    # lexsort() is stable, so this is equivalent to sorting by camera, and then
+    # by frame
+    files = list(mapping_file_corners.keys())
+
+    # shape (Nobservations,2); each row is (original frame number, icam)
+    framenocameraindex = np.array([file_framenocameraindex[f] for f in files],
+                                  dtype=int).reshape(len(files),2)
+    isort = np.lexsort( (framenocameraindex[:,1], framenocameraindex[:,0]) )
+    files_sorted       = [files[i] for i in isort]
+    framenocameraindex = framenocameraindex[isort]
+
+    # The frame indices I return are consecutive starting from 0, NOT the
+    # original frame numbers. The frame numbers are sorted, so the inverse
+    # indices of np.unique() are exactly these
+    indices_frame_camera = np.empty( (len(files_sorted),2), dtype=np.int32)
+    indices_frame_camera[:,0] = \
+        np.unique(framenocameraindex[:,0], return_inverse=True)[1].ravel()
+    indices_frame_camera[:,1] = framenocameraindex[:,1]
+
+    # The parser already gathered all the observations into one array. I
+    # pick out the ones I'm using, in order, with one indexing operation. Very
+    # often the corners data is already sorted, and I use all of it. Then I can
+    # return the parsed array as is, without copying it
+    iobservations = np.array([mapping_file_corners[f] for f in files_sorted],
+                             dtype=int)
+    if len(iobservations) == len(observations_all) and \
+       np.all(iobservations == np.arange(len(iobservations))):
+        observations = observations_all
+    else:
+        observations = observations_all[iobservations]
 
     return observations, indices_frame_camera, files_sorted
 
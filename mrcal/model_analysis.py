@@ -477,15 +477,9 @@ broadcasting
     if cov.shape[-1] != cov.shape[-2]:
         raise Exception(f"covariance matrices must be square. Got cov.shape = {cov.shape}")
 
-    import scipy.sparse.linalg
-    @nps.broadcast_define( (('N','N',),),
-                           () )
-    def largest_eigenvalue(V):
-        return \
-            scipy.sparse.linalg.eigsh(V, 1,
-                                      which               = 'LM',
-                                      return_eigenvectors = False)[0]
-    return np.sqrt(largest_eigenvalue(cov))
+    # eigvalsh() broadcasts over the leading dimensions in one call, and returns
+    # the eigenvalues in ascending order
+    return np.sqrt(np.linalg.eigvalsh(cov)[...,-1])
 
 
 def _observed_pixel_uncertainty_from_inputs(optimization_inputs,
@@ -1334,7 +1328,11 @@ broadcasts on p_cam only. We accept
   atinfinity: the distance to the camera is ignored.
 
 - model: a mrcal.cameramodel object that contains optimization_inputs, which are
-  used to propagate the uncertainty
+  used to propagate the uncertainty. Alternately, an iterable of models that
+  came from the same calibration solve. In that case the uncertainty for all of
+  them is computed at once, reusing the same factorization. p_cam then has an
+  extra leading dimension: its shape is (Nmodels,...,3) or (1,...,3), and the
+  output has a leading dimension of Nmodels
 
 - atinfinity: optional boolean, defaults to False. If True, we want to know the
   projection uncertainty, looking at a point infinitely-far away. We propagate
@@ -1392,8 +1390,17 @@ else:                    we return an array of shape (...)
         raise Exception(f"Unknown uncertainty method: '{method}'. I know about {known_methods}")
 
 
-    # which calibration-time camera we're looking at
-    icam_intrinsics = model.icam_intrinsics()
+    if isinstance(model, mrcal.cameramodel):
+        models = None
+    else:
+        # Several models from the same solve
+        models = list(model)
+        if len(models) == 0:
+            raise Exception("An empty list of models was given")
+        for i in range(1,len(models)):
+            if not models[i]._optimization_inputs_match(models[0]):
+                raise Exception(f"The optimization_inputs for all of the given models must be identical, but models[{i}] doesn't match models[0]")
+        model = models[0]
 
     optimization_inputs = model.optimization_inputs()
     if optimization_inputs is None:
@@ -1423,47 +1430,7 @@ else:                    we return an array of shape (...)
        method == 'cross-reprojection-rrp-Jfp':
         raise Exception(f"cross-reprojection-rrp-Jfp uncertainty implemented only if frames are being optimized")
 
-    # Now the extrinsics. I look at all the ones that correspond with the
-    # specific camera I care about. If the camera is stationary, this will
-    # produce exactly one set of extrinsics. If the camera is moving, we may get
-    # more than one. At this time I limit to myself to a consecutive block of
-    # extrinsics vectors. Once this all works I can relax that requirement
-    ifcice = optimization_inputs['indices_frame_camintrinsics_camextrinsics']
-    icam_extrinsics = np.unique( ifcice[ifcice[:,1] == icam_intrinsics, 2] ) # sorted
-    if icam_extrinsics.size == 0:
-        raise Exception(f"No extrinsics corresponding to {icam_intrinsics=}. I don't know what to do")
-    if icam_extrinsics.size > 1:
-        d = np.unique(np.diff(icam_extrinsics))
-        if not (d.size == 1 and d[0] == 1):
-            raise Exception("At this point I'm only supporting consecutive block of extrinsics for a given icam_intrinsics")
-    if icam_extrinsics[0] < 0:
-        if icam_extrinsics.size == 1:
-            # Stationary camera, at the reference
-            extrinsics_rt_fromref = mrcal.identity_rt()
-            istate_extrinsics0    = None
-        else:
-            # Moving camera. One of the poses is at the reference. This requires
-            # more typing. I'll do this later
-            raise Exception("Have moving camera, some poses are at the reference. This isn't supported yet")
-    else:
-        # I will now be guaranteed to get extrinsics_rt_fromref with the right
-        # number of extrinsics (all the ones that correspond to this
-        # icam_intrinsics). And I know they're a contiguous block in my
-        # optimization vector starting with istate_extrinsics0
-        extrinsics_rt_fromref = get_input('extrinsics_rt_fromref')[icam_extrinsics,:]
-        istate_extrinsics0 = mrcal.state_index_extrinsics(icam_extrinsics[0],
-                                                          **optimization_inputs)
-
-    # The intrinsics,extrinsics,frames MUST come from the solve when evaluating
-    # the uncertainties. The user is allowed to update the extrinsics in the
-    # model after the solve, as long as I use the solve-time ones for the
-    # uncertainty computation. Updating the intrinsics invalidates the
-    # uncertainty stuff so I COULD grab those from the model. But for good
-    # hygiene I get them from the solve as well
-
-    lensmodel       = optimization_inputs['lensmodel']
-    intrinsics_data = optimization_inputs['intrinsics'][icam_intrinsics]
-    istate_intrinsics0        = mrcal.state_index_intrinsics(icam_intrinsics, **optimization_inputs)
+    lensmodel = optimization_inputs['lensmodel']
     Nstates_intrinsics        = \
         mrcal.num_intrinsics_optimization_params(**optimization_inputs)
     if not optimization_inputs.get('do_optimize_intrinsics_core') and \
@@ -1474,20 +1441,77 @@ else:                    we return an array of shape (...)
 
     Nstate = mrcal.num_states(**optimization_inputs)
 
-    # if method == 'bestq', this has shape (..., Ngeometry, 2, Nstate)
-    # else:                                (...,            2, Nstate)
-    dq_db = \
-        _dq_db__projection_uncertainty( p_cam,
-                                        lensmodel, intrinsics_data,
-                                        extrinsics_rt_fromref, frames_rt_toref,
-                                        Nstate,
-                                        istate_intrinsics0,
-                                        istate_intrinsics0_onecam,
-                                        Nstates_intrinsics,
-                                        istate_extrinsics0, istate_frames0,
-                                        atinfinity = atinfinity,
-                                        method     = method,
-                                        Kunpacked  = Kunpacked)
+    def dq_db_model(p_cam, icam_intrinsics):
+
+        # Now the extrinsics. I look at all the ones that correspond with the
+        # specific camera I care about. If the camera is stationary, this will
+        # produce exactly one set of extrinsics. If the camera is moving, we may
+        # get more than one. At this time I limit to myself to a consecutive
+        # block of extrinsics vectors. Once this all works I can relax that
+        # requirement
+        ifcice = optimization_inputs['indices_frame_camintrinsics_camextrinsics']
+        icam_extrinsics = np.unique( ifcice[ifcice[:,1] == icam_intrinsics, 2] ) # sorted
+        if icam_extrinsics.size == 0:
+            raise Exception(f"No extrinsics corresponding to {icam_intrinsics=}. I don't know what to do")
+        if icam_extrinsics.size > 1:
+            d = np.unique(np.diff(icam_extrinsics))
+            if not (d.size == 1 and d[0] == 1):
+                raise Exception("At this point I'm only supporting consecutive block of extrinsics for a given icam_intrinsics")
+        if icam_extrinsics[0] < 0:
+            if icam_extrinsics.size == 1:
+                # Stationary camera, at the reference
+                extrinsics_rt_fromref = mrcal.identity_rt()
+                istate_extrinsics0    = None
+            else:
+                # Moving camera. One of the poses is at the reference. This
+                # requires more typing. I'll do this later
+                raise Exception("Have moving camera, some poses are at the reference. This isn't supported yet")
+        else:
+            # I will now be guaranteed to get extrinsics_rt_fromref with the
+            # right number of extrinsics (all the ones that correspond to this
+            # icam_intrinsics). And I know they're a contiguous block in my
+            # optimization vector starting with istate_extrinsics0
+            extrinsics_rt_fromref = get_input('extrinsics_rt_fromref')[icam_extrinsics,:]
+            istate_extrinsics0 = mrcal.state_index_extrinsics(icam_extrinsics[0],
+                                                              **optimization_inputs)
+
+        # The intrinsics,extrinsics,frames MUST come from the solve when
+        # evaluating the uncertainties. The user is allowed to update the
+        # extrinsics in the model after the solve, as long as I use the
+        # solve-time ones for the uncertainty computation. Updating the
+        # intrinsics invalidates the uncertainty stuff so I COULD grab those
+        # from the model. But for good hygiene I get them from the solve as well
+        intrinsics_data    = optimization_inputs['intrinsics'][icam_intrinsics]
+        istate_intrinsics0 = mrcal.state_index_intrinsics(icam_intrinsics, **optimization_inputs)
+
+        # if method == 'bestq', this has shape (..., Ngeometry, 2, Nstate)
+        # else:                                (...,            2, Nstate)
+        return \
+            _dq_db__projection_uncertainty( p_cam,
+                                            lensmodel, intrinsics_data,
+                                            extrinsics_rt_fromref, frames_rt_toref,
+                                            Nstate,
+                                            istate_intrinsics0,
+                                            istate_intrinsics0_onecam,
+                                            Nstates_intrinsics,
+                                            istate_extrinsics0, istate_frames0,
+                                            atinfinity = atinfinity,
+                                            method     = method,
+                                            Kunpacked  = Kunpacked)
+
+    if models is None:
+        dq_db = dq_db_model(p_cam, model.icam_intrinsics())
+    else:
+        # shape (Nmodels, ..., 3)
+        p_cam = nps.atleast_dims(p_cam, -2)
+        if p_cam.shape[0] != 1 and p_cam.shape[0] != len(models):
+            raise Exception(f"Given {len(models)} models, so p_cam must have shape (Nmodels,...,3) or (1,...,3). Got {p_cam.shape=}")
+        # I stack all the gradients, and propagate them together. This reuses
+        # the same factorization for all the models
+        dq_db = \
+            nps.cat(*[ dq_db_model(p_cam[i if p_cam.shape[0] > 1 else 0],
+                                   models[i].icam_intrinsics()) \
+                       for i in range(len(models)) ])
 
     # In case of bestq I compute the uncertainty Ngeometry times, and report
     # the best one. To keep things simple I use the trace metric: "best" means
@@ -1776,14 +1800,27 @@ A tuple
        not intrinsics_only and focus_radius != 0 and \
        implied_Rt10 is None:
         try:
-            # len(uncertainties) = Ncameras. Each has shape (len(distance),Nh,Nw)
-            uncertainties = \
-                [ mrcal.projection_uncertainty(# shape (len(distance),Nheight,Nwidth,3)
-                                               v[i] * distance,
-                                               models[i],
-                                               atinfinity = atinfinity,
-                                               what       = 'worstdirection-stdev') \
-                  for i in range(len(models)) ]
+            if all(models[i]._optimization_inputs_match(models[0]) \
+                   for i in range(1,len(models))):
+                # All the models come from the same solve, so I evaluate all
+                # of them at once, reusing the same factorization
+                #
+                # shape (Ncameras,len(distance),Nh,Nw)
+                uncertainties = \
+                    mrcal.projection_uncertainty(# shape (Ncameras,len(distance),Nheight,Nwidth,3)
+                                                 nps.dummy(v,1) * distance,
+                                                 models,
+                                                 atinfinity = atinfinity,
+                                                 what       = 'worstdirection-stdev')
+            else:
+                # len(uncertainties) = Ncameras. Each has shape (len(distance),Nh,Nw)
+                uncertainties = \
+                    [ mrcal.projection_uncertainty(# shape (len(distance),Nheight,Nwidth,3)
+                                                   v[i] * distance,
+                                                   models[i],
+                                                   atinfinity = atinfinity,
+                                                   what       = 'worstdirection-stdev') \
+                      for i in range(len(models)) ]
         except Exception as e:
             print(f"WARNING: projection_diff() was asked to use uncertainties, but they aren't available/couldn't be computed. Falling back on the region-based-only logic. Caught exception: {e}",
                   file = sys.stderr)
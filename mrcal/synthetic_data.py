@@ -688,12 +688,16 @@ None
         # shape (Nobservations,3)
         pref = optimization_inputs['points'][ indices_point_camintrinsics_camextrinsics[:,0] ]
 
+        # icam_extrinsics<0 means "at the reference". I fill in the identity
+        # transform in slot 0, and write the rest in-place, without gluing
+        extrinsics_rt_fromref = optimization_inputs['extrinsics_rt_fromref']
+        Rt_cam_ref = np.empty( (len(extrinsics_rt_fromref)+1,4,3), dtype=float)
+        Rt_cam_ref[0] = mrcal.identity_Rt()
+        mrcal.Rt_from_rt(extrinsics_rt_fromref,
+                         out = Rt_cam_ref[1:])
+
         # shape (Nobservations,4,3)
-        Rt_cam_ref = \
-            nps.glue( mrcal.identity_Rt(),
-                      mrcal.Rt_from_rt(optimization_inputs['extrinsics_rt_fromref']),
-                      axis = -3 ) \
-            [ indices_point_camintrinsics_camextrinsics[:,2]+1 ]
+        Rt_cam_ref = Rt_cam_ref[ indices_point_camintrinsics_camextrinsics[:,2]+1 ]
 
         # shape (Nobservations,3)
         pcam = mrcal.transform_point_Rt(Rt_cam_ref, pref)
@@ -1384,9 +1384,11 @@ if optimization_inputs is None and q_observation_stdev is None:
 
             Nframes = len(rt_ref_frame)
 
-            # shape (..., 3,6)
+            # shape (..., Nframes,3,6). Scaled in place: this is copied into
+            # dp_triangulated_db directly, so I don't want another temporary
             dp_triangulated_drtrf = np.linalg.solve(dp_frames_dp_cam0,
-                                                    dp_frames_drtrf) / Nframes
+                                                    dp_frames_drtrf)
+            dp_triangulated_drtrf /= Nframes
         else:
             # the frames are fixed; not subject to optimization
             dp_triangulated_drtrf = None
@@ -1426,6 +1428,38 @@ if optimization_inputs is None and q_observation_stdev is None:
             istate_f0     = None
             Nstate_frames = None
 
+        # Do the right thing is we're optimizing partial intrinsics only
+        i0,i1 = None,None # everything by default
+        has_core     = mrcal.lensmodel_metadata_and_config(optimization_inputs['lensmodel'])['has_core']
+        Ncore        = 4 if has_core else 0
+        Ndistortions = mrcal.lensmodel_num_params(optimization_inputs['lensmodel']) - Ncore
+        if not optimization_inputs.get('do_optimize_intrinsics_core'):
+            i0 = Ncore
+        if not optimization_inputs.get('do_optimize_intrinsics_distortions'):
+            i1 = -Ndistortions
+        slice_optimized_intrinsics  = slice(i0,i1)
+
+        # The state indices depend only on the camera, and usually all the
+        # slices use the same camera pair. Each lookup passes all of
+        # optimization_inputs into the C library, so I look up each camera
+        # only once
+        istate_cache = dict()
+        def istate_camera(icam_intrinsics):
+            r'''Returns (istate_intrinsics, icam_extrinsics, istate_extrinsics)
+
+            istate_extrinsics is None if this camera sits at the reference
+
+            '''
+            if icam_intrinsics not in istate_cache:
+                istate_i        = mrcal.state_index_intrinsics(icam_intrinsics, **optimization_inputs)
+                icam_extrinsics = mrcal.corresponding_icam_extrinsics(icam_intrinsics, **optimization_inputs)
+                if icam_extrinsics >= 0:
+                    istate_e = mrcal.state_index_extrinsics(icam_extrinsics, **optimization_inputs)
+                else:
+                    istate_e = None
+                istate_cache[icam_intrinsics] = (istate_i, icam_extrinsics, istate_e)
+            return istate_cache[icam_intrinsics]
+
     else:
         # We don't need to evaluate the calibration-time noise.
         dp_triangulated_db = None
@@ -1496,16 +1530,6 @@ if optimization_inputs is None and q_observation_stdev is None:
             dp_triangulated_drt_0ref = None
 
 
-        # Do the right thing is we're optimizing partial intrinsics only
-        i0,i1 = None,None # everything by default
-        has_core     = mrcal.lensmodel_metadata_and_config(optimization_inputs['lensmodel'])['has_core']
-        Ncore        = 4 if has_core else 0
-        Ndistortions = mrcal.lensmodel_num_params(optimization_inputs['lensmodel']) - Ncore
-        if not optimization_inputs.get('do_optimize_intrinsics_core'):
-            i0 = Ncore
-        if not optimization_inputs.get('do_optimize_intrinsics_distortions'):
-            i1 = -Ndistortions
-        slice_optimized_intrinsics  = slice(i0,i1)
         dvlocal0_dintrinsics0 = dvlocal0_dintrinsics0[...,slice_optimized_intrinsics]
         dvlocal1_dintrinsics1 = dvlocal1_dintrinsics1[...,slice_optimized_intrinsics]
 
@@ -1517,11 +1541,11 @@ if optimization_inputs is None and q_observation_stdev is None:
         #   r_0ref,r_1ref,t_0ref,t_1ref -> t01
         #   vlocal1,r01                 -> v1
         #   v0,v1,t01                   -> p_triangulated
-        icam_intrinsics0 = models01[0].icam_intrinsics()
-        icam_intrinsics1 = models01[1].icam_intrinsics()
+        istate_i0, icam_extrinsics0, istate_e0 = \
+            istate_camera(models01[0].icam_intrinsics())
+        istate_i1, icam_extrinsics1, istate_e1 = \
+            istate_camera(models01[1].icam_intrinsics())
 
-        istate_i0 = mrcal.state_index_intrinsics(icam_intrinsics0, **optimization_inputs)
-        istate_i1 = mrcal.state_index_intrinsics(icam_intrinsics1, **optimization_inputs)
         if istate_i0 is not None:
             # dp_triangulated_di0 = dp_triangulated_dv0              dvlocal0_di0
             # dp_triangulated_di1 = dp_triangulated_dv1 dv1_dvlocal1 dvlocal1_di1
@@ -1535,59 +1559,39 @@ if optimization_inputs is None and q_observation_stdev is None:
                          out = dp_triangulated_db[ipt, :, istate_i1:istate_i1+Nintrinsics])
 
 
-        icam_extrinsics0 = mrcal.corresponding_icam_extrinsics(icam_intrinsics0, **optimization_inputs)
-        icam_extrinsics1 = mrcal.corresponding_icam_extrinsics(icam_intrinsics1, **optimization_inputs)
-
-        if icam_extrinsics0 >= 0:
-            istate_e0 = mrcal.state_index_extrinsics(icam_extrinsics0, **optimization_inputs)
-        else:
-            istate_e0 = None
-        if icam_extrinsics1 >= 0:
-            istate_e1 = mrcal.state_index_extrinsics(icam_extrinsics1, **optimization_inputs)
-        else:
-            istate_e1 = None
-
-        if istate_e1 is not None:
+        if istate_e0 is not None or istate_e1 is not None:
             # dp_triangulated_dr_0ref = dp_triangulated_dv1  dv1_dr01 dr01_dr_0ref +
             #                           dp_triangulated_dt01          dt01_dr_0ref
             # dp_triangulated_dr_1ref = dp_triangulated_dv1  dv1_dr01 dr01_dr_1ref +
             #                           dp_triangulated_dt01          dt01_dr_1ref
             # dp_triangulated_dt_0ref = dp_triangulated_dt01          dt01_dt_0ref
             # dp_triangulated_dt_1ref = dp_triangulated_dt01          dt01_dt_1ref
-            dr01_dr_ref1    = drt01_drt_ref1[:3,:3]
-            dr_ref1_dr_1ref = drt_ref1_drt_1ref[:3,:3]
-            dr01_dr_1ref    = nps.matmult(dr01_dr_ref1, dr_ref1_dr_1ref)
+            #
+            # r01 doesn't depend on any translations, so dr01_dt_... = 0. Thus
+            # all of these are the blocks of one product:
+            #
+            #   dp_triangulated_drt_0ref = dp_triangulated_drt01 drt01_drt_0ref
+            #   dp_triangulated_drt_1ref = dp_triangulated_drt01 drt01_drt_ref1 drt_ref1_drt_1ref
+            #
+            # where dp_triangulated_drt01 = [dp_triangulated_dv1 dv1_dr01, dp_triangulated_dt01].
+            # I compute each (3,6) block with a single matmult
+            #
+            # shape (3,6)
+            dp_triangulated_drt01 = \
+                nps.glue( nps.matmult(dp_triangulated_dv1, dv1_dr01),
+                          dp_triangulated_dt01,
+                          axis = -1 )
 
-            dt01_drt_ref1 = drt01_drt_ref1[3:,:]
-            dt01_dr_1ref  = nps.matmult(dt01_drt_ref1, drt_ref1_drt_1ref[:,:3])
-            dt01_dt_1ref  = nps.matmult(dt01_drt_ref1, drt_ref1_drt_1ref[:,3:])
-
-            nps.matmult( dp_triangulated_dv1,
-                         dv1_dr01,
-                         dr01_dr_1ref,
-                         out = dp_triangulated_db[ipt, :, istate_e1:istate_e1+3])
-            dp_triangulated_db[ipt, :, istate_e1:istate_e1+3] += \
-                nps.matmult(dp_triangulated_dt01, dt01_dr_1ref)
-
-            nps.matmult( dp_triangulated_dt01,
-                         dt01_dt_1ref,
-                         out = dp_triangulated_db[ipt, :, istate_e1+3:istate_e1+6])
+        if istate_e1 is not None:
+            nps.matmult( dp_triangulated_drt01,
+                         drt01_drt_ref1,
+                         drt_ref1_drt_1ref,
+                         out = dp_triangulated_db[ipt, :, istate_e1:istate_e1+6])
 
         if istate_e0 is not None:
-            dr01_dr_0ref = drt01_drt_0ref[:3,:3]
-            dt01_dr_0ref = drt01_drt_0ref[3:,:3]
-            dt01_dt_0ref = drt01_drt_0ref[3:,3:]
-
-            nps.matmult( dp_triangulated_dv1,
-                         dv1_dr01,
-                         dr01_dr_0ref,
-                         out = dp_triangulated_db[ipt, :, istate_e0:istate_e0+3])
-            dp_triangulated_db[ipt, :, istate_e0:istate_e0+3] += \
-                nps.matmult(dp_triangulated_dt01, dt01_dr_0ref)
-
-            nps.matmult( dp_triangulated_dt01,
-                         dt01_dt_0ref,
-                         out = dp_triangulated_db[ipt, :, istate_e0+3:istate_e0+6])
+            nps.matmult( dp_triangulated_drt01,
+                         drt01_drt_0ref,
+                         out = dp_triangulated_db[ipt, :, istate_e0:istate_e0+6])
 
             if dp_triangulated_drt_0ref is not None:
                 dp_triangulated_db[ipt, :, istate_e0:istate_e0+6] += dp_triangulated_drt_0ref
@@ -1597,9 +1601,14 @@ if optimization_inputs is None and q_observation_stdev is None:
             # are optimizing the frames AND we have stabilization enabled.
             # Without stabilization, there's no dependence on rt_ref_frame
 
-            # dp_triangulated_drtrf has shape (Npoints,Nframes,3,6). I reshape to (Npoints,3,Nframes*6)
-            dp_triangulated_db[ipt, :, istate_f0:istate_f0+Nstate_frames] = \
-                nps.clump(nps.xchg(dp_triangulated_drtrf,-2,-3), n=-2)
+            # dp_triangulated_drtrf has shape (Nframes,3,6). The output is
+            # (3,Nframes*6). I write through a (Nframes,3,6) view of the output
+            # instead of making a transposed, clumped copy of the input first.
+            # Splitting the last axis of the output slice never needs a copy,
+            # so this reshape is always a view
+            nps.xchg(dp_triangulated_db[ipt, :, istate_f0:istate_f0+Nstate_frames]. \
+                       reshape(3,-1,6),
+                     -2,-3)[...] = dp_triangulated_drtrf
 
     # Returning the istate stuff for the test suite. These are the istate_...
     # and icam_... for the last slice only. This is good-enough for the test
@@ -1950,7 +1959,13 @@ Complete logic:
 
         # reshape dp_triangulated_db to (Npoints*3, Nstate)
         # So the Var(p) will end up with shape (Npoints*3, Npoints*3)
-        dp_triangulated_db = nps.clump(dp_triangulated_db,n=2)
+        #
+        # This array is mine, so I convert it to the packed state in place.
+        # Passing dF_db instead would make _propagate_calibration_uncertainty()
+        # copy it first. I call "unpack_state" because the state is in the
+        # denominator
+        dp_triangulated_dbpacked = nps.clump(dp_triangulated_db,n=2)
+        mrcal.unpack_state(dp_triangulated_dbpacked, **optimization_inputs)
 
         if q_calibration_stdev > 0:
             # Calibration-time noise is given. Use it.
@@ -1963,7 +1978,7 @@ Complete logic:
         Var_p_calibration_flat = \
             mrcal.model_analysis._propagate_calibration_uncertainty(
                                                'covariance',
-                                               dF_db                      = dp_triangulated_db,
+                                               dF_dbpacked                = dp_triangulated_dbpacked,
                                                observed_pixel_uncertainty = observed_pixel_uncertainty,
                                                optimization_inputs        = optimization_inputs)
 
@@ -2009,10 +2024,13 @@ Complete logic:
         Var_p_joint = np.zeros((broadcasted_shape + (3,) +
                                 broadcasted_shape + (3,)), dtype=float)
     if Var_p_observation is not None:
-        Var_p_joint_flat = Var_p_joint.reshape(len(slices)*3,
-                                               len(slices)*3)
-        for ipt in range(len(slices)):
-            Var_p_joint_flat[ipt*3:(ipt+1)*3,ipt*3:(ipt+1)*3] += \
-                Var_p_observation_flat[ipt,...]
+        # The observation-time noise is independent for each point, so it
+        # contributes only to the (3,3) blocks on the diagonal. I add all of
+        # them with one fancy-indexed update
+        Npoints = len(slices)
+        ipt     = np.arange(Npoints)
+        Var_p_joint_flat = Var_p_joint.reshape(Npoints,3,
+                                               Npoints,3)
+        Var_p_joint_flat[ipt,:,ipt,:] += Var_p_observation_flat
 
     return p, Var_p_calibration, Var_p_observation, Var_p_joint
@@ -544,11 +544,16 @@ RETURNED VALUE
     frames_Rt_toref = \
         mrcal.Rt_from_rt( optimization_inputs['frames_rt_toref'] )\
         [ indices_frame_camintrinsics_camextrinsics[:,0] ]
+    # icam_extrinsics<0 means "at the reference". I fill in the identity
+    # transform in slot 0, and write the rest in-place, without gluing
+    extrinsics_rt_fromref = optimization_inputs['extrinsics_rt_fromref']
     extrinsics_Rt_fromref = \
-        nps.glue( mrcal.identity_Rt(),
-                  mrcal.Rt_from_rt(optimization_inputs['extrinsics_rt_fromref']),
-                  axis = -3 ) \
-        [ indices_frame_camintrinsics_camextrinsics[:,2]+1 ]
+        np.empty( (len(extrinsics_rt_fromref)+1,4,3), dtype=float)
+    extrinsics_Rt_fromref[0] = mrcal.identity_Rt()
+    mrcal.Rt_from_rt(extrinsics_rt_fromref,
+                     out = extrinsics_Rt_fromref[1:])
+    extrinsics_Rt_fromref = \
+        extrinsics_Rt_fromref[ indices_frame_camintrinsics_camextrinsics[:,2]+1 ]
 
     Rt_cam_frame = mrcal.compose_Rt( extrinsics_Rt_fromref,
                                      frames_Rt_toref )
@@ -1289,7 +1294,8 @@ def _plot_arg_covariance_ellipse(q_mean, Var, what):
 def _plot_args_points_and_covariance_ellipse(q, what):
     q_mean  = np.mean(q,axis=-2)
     q_mean0 = q - q_mean
-    Var     = np.mean( nps.outer(q_mean0,q_mean0), axis=0 )
+    # mean(outer(q_mean0,q_mean0)) without the (N,2,2) temporary
+    Var     = nps.matmult(nps.transpose(q_mean0), q_mean0) / q_mean0.shape[0]
     # Some functions assume that we're plotting _with = "dots". Look for the
     # callers if changing this
     return ( _plot_arg_covariance_ellipse(q_mean,Var, what),
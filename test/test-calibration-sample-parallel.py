@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+
+r'''Checks calibration_sample() with Nprocesses > 1
+
+The solves may be farmed out to worker processes. These send back only what the
+solve changed, so I make sure the results are identical to the ones I get from
+solving everything in this process. I turn on the outlier rejection, so the
+outlier weights written into the observations must make it back also
+
+'''
+
+import sys
+import numpy as np
+import numpysane as nps
+import os
+
+testdir = os.path.dirname(os.path.realpath(__file__))
+
+# I import the LOCAL mrcal since that's what I'm testing
+sys.path[:0] = f"{testdir}/..",
+import mrcal
+import testutils
+
+from test_calibration_helpers import calibration_baseline,calibration_sample
+
+# I want the RNG to be deterministic
+np.random.seed(0)
+
+Ncameras    = 2
+Nframes     = 20
+Nsamples    = 4
+fixedframes = False
+
+object_spacing          = 0.1
+object_width_n          = 10
+object_height_n         = 9
+calobject_warp_true     = np.array((0.002, -0.005))
+
+extrinsics_rt_fromref_true = \
+    np.array(((0,    0,    0,      0,   0,   0),
+              (0.08, 0.2,  0.02,   1.,  0.9, 0.1), ))
+
+optimization_inputs_baseline, \
+models_true,                  \
+frames_true =                 \
+    calibration_baseline('opencv4',
+                         Ncameras,
+                         Nframes,
+                         None,
+                         object_width_n,
+                         object_height_n,
+                         object_spacing,
+                         extrinsics_rt_fromref_true,
+                         calobject_warp_true,
+                         fixedframes,
+                         testdir)
+
+# I make sure there are outliers to reject: I move 1% of the observations far
+# off
+optimization_inputs_baseline['do_apply_outlier_rejection'] = True
+observations = optimization_inputs_baseline['observations_board']
+NobservedPoints = observations.size // 3
+idx_outliers = np.unravel_index(np.random.choice( NobservedPoints,
+                                                  (NobservedPoints//100,),
+                                                  replace = False ),
+                                observations.shape[:-1])
+observations[idx_outliers + (slice(0,2),)] += 20.
+
+results = dict()
+for Nprocesses in (1,2):
+    # Same noise in each run
+    np.random.seed(1)
+    results[Nprocesses] = \
+        calibration_sample( Nsamples,
+                            optimization_inputs_baseline,
+                            0.3,
+                            fixedframes,
+                            Nprocesses = Nprocesses)
+
+optimization_inputs_sampled     = results[1][-1]
+optimization_inputs_sampled_par = results[2][-1]
+
+testutils.confirm( all( np.any(optimization_inputs_sampled[isample]['observations_board'][...,2] < 0) \
+                        for isample in range(Nsamples) ),
+                   msg = "Outliers were rejected in each sample")
+
+for ifield,what in ((0, 'intrinsics_sampled'),
+                    (1, 'extrinsics_sampled_mounted'),
+                    (2, 'frames_sampled'),
+                    (4, 'calobject_warp_sampled'),
+                    (5, 'q_noise_board_sampled'),
+                    (7, 'b_sampled_unpacked')):
+    testutils.confirm_equal(results[2][ifield], results[1][ifield],
+                            worstcase = True,
+                            eps       = 1e-12,
+                            msg       = f"{what} identical with Nprocesses=2")
+
+for isample in range(Nsamples):
+    for k,v in optimization_inputs_sampled[isample].items():
+        if not isinstance(v, np.ndarray):
+            continue
+        testutils.confirm_equal(optimization_inputs_sampled_par[isample][k], v,
+                                worstcase = True,
+                                eps       = 1e-12,
+                                msg       = f"optimization_inputs_sampled[{isample}]['{k}'] identical with Nprocesses=2")
+
+testutils.finish()
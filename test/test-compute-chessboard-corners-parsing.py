@@ -5,7 +5,6 @@ r'''Tests the parsing of corners.vnl data
 
 import sys
 import numpy as np
-import numpysane as nps
 import os
 
 testdir = os.path.dirname(os.path.realpath(__file__))
@@ -16,6 +15,11 @@ import mrcal
 import testutils
 import io
 
+# All the test datasets below observe the same corners: x,y of each corner in
+# the 2x3 grid, offset by 10 pixels for each successive observation
+x,y          = np.meshgrid(np.arange(2), np.arange(3))
+frame_offset = (np.arange(5)*10)[:,np.newaxis,np.newaxis]
+
 
 corners_all_or_none_noweight = r'''# filename x y
 frame100-cam1.jpg 0 0
@@ -52,16 +56,10 @@ frame102-cam2.jpg 41 42
 '''
 
 observations_ref = np.empty((5,3,2,3), dtype=float)
-observations_ref_x = observations_ref[:,:,:,0]
-observations_ref_y = nps.transpose(observations_ref[:,:,:,1])
-observations_ref_x[:] = np.arange(2)
-observations_ref_y[:] = np.arange(3)
-
-observations_ref_w = nps.clump(observations_ref[:,:,:,2], n=3)
-observations_ref_w[:] = 1.0 # default weight
+observations_ref[...,0] = x + frame_offset
+observations_ref[...,1] = y + frame_offset
 
-observations_ref_frame = nps.mv(observations_ref[..., :2], 0, -1)
-observations_ref_frame += np.arange(5)*10
+observations_ref[...,2] = 1.0 # default weight
 
 indices_frame_camera_ref = np.array(((0,0),
                                      (0,1),
@@ -134,19 +132,13 @@ frame102-cam2.jpg 41 42 0.30
 '''
 
 observations_ref = np.empty((5,3,2,3), dtype=float)
-observations_ref_x = observations_ref[:,:,:,0]
-observations_ref_y = nps.transpose(observations_ref[:,:,:,1])
-observations_ref_x[:] = np.arange(2)
-observations_ref_y[:] = np.arange(3)
+observations_ref[...,0] = x + frame_offset
+observations_ref[...,1] = y + frame_offset
 
-observations_ref_w = nps.clump(observations_ref[:,:,:,2], n=3)
-observations_ref_w[:] = (np.arange(30) + 1) / 100
+observations_ref[...,2] = ((np.arange(30) + 1) / 100).reshape(5,3,2)
 observations_ref[4,1,0,2] = -1.
 observations_ref[4,2,0,2] = -1.
 
-observations_ref_frame = nps.mv(observations_ref[..., :2], 0, -1)
-observations_ref_frame += np.arange(5)*10
-
 indices_frame_camera_ref = np.array(((0,0),
                                      (0,1),
                                      (1,0),
@@ -219,19 +211,13 @@ frame102-cam2.jpg 41 42 5
 '''
 
 observations_ref = np.empty((5,3,2,3), dtype=float)
-observations_ref_x = observations_ref[:,:,:,0]
-observations_ref_y = nps.transpose(observations_ref[:,:,:,1])
-observations_ref_x[:] = np.arange(2)
-observations_ref_y[:] = np.arange(3)
+observations_ref[...,0] = x + frame_offset
+observations_ref[...,1] = y + frame_offset
 
-observations_ref_w = nps.clump(observations_ref[:,:,:,2], n=-2)
-observations_ref_w[:] = np.power(2., -np.arange(6))
+observations_ref[...,2] = np.power(2., -np.arange(6)).reshape(3,2)
 observations_ref[4,1,0,2] = -1.
 observations_ref[4,2,0,2] = -1.
 
-observations_ref_frame = nps.mv(observations_ref[..., :2], 0, -1)
-observations_ref_frame += np.arange(5)*10
-
 indices_frame_camera_ref = np.array(((0,0),
                                      (0,1),
                                      (1,0),
@@ -307,16 +293,10 @@ frame102-cam2.jpg 41 42 0.30
 '''
 
 observations_ref = np.empty((5,3,2,3), dtype=float)
-observations_ref_x = observations_ref[:,:,:,0]
-observations_ref_y = nps.transpose(observations_ref[:,:,:,1])
-observations_ref_x[:] = np.arange(2)
-observations_ref_y[:] = np.arange(3)
-
-observations_ref_frame = nps.mv(observations_ref[..., :2], 0, -1)
-observations_ref_frame += np.arange(5)*10
+observations_ref[...,0] = x + frame_offset
+observations_ref[...,1] = y + frame_offset
 
-observations_ref_w = nps.clump(observations_ref[:,:,:,2], n=3)
-observations_ref_w[:] = (np.arange(30) + 1) / 100
+observations_ref[...,2] = ((np.arange(30) + 1) / 100).reshape(5,3,2)
 observations_ref[4,1,0,:] = -1.
 observations_ref[4,2,0,:] = -1.
 observations_ref[2,1,0,2] = 1.0 # missing weight in the datafile: use default
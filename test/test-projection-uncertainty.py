@@ -213,18 +213,7 @@ from test_calibration_helpers import calibration_baseline,calibration_make_non_v
 
 fixedframes = (args.fixed == 'frames')
 
-import tempfile
-import atexit
-import shutil
-workdir = tempfile.mkdtemp()
-def cleanup():
-    global workdir
-    try:
-        shutil.rmtree(workdir)
-        workdir = None
-    except:
-        pass
-atexit.register(cleanup)
+import io
 
 
 
@@ -370,6 +359,20 @@ models_baseline = \
 # to evaluate a different world point for each camera
 q0_baseline = imagersizes[0]/3.
 
+# These are at the no-noise-but-with-regularization optimum
+intrinsics_baseline         = nps.cat( *[m.intrinsics()[1]         for m in models_baseline] )
+extrinsics_baseline_mounted = nps.cat( *[m.extrinsics_rt_fromref() for m in models_baseline] )
+frames_baseline             = optimization_inputs_baseline['frames_rt_toref']
+points_baseline             = optimization_inputs_baseline['points']
+calobject_warp_baseline     = optimization_inputs_baseline['calobject_warp']
+
+# The observation direction of q0_baseline in each camera. This doesn't depend
+# on the distance, so I compute it once, and scale it as needed
+#
+# shape (Ncameras,3)
+v0_cam_baseline = mrcal.unproject(q0_baseline, lensmodel, intrinsics_baseline,
+                                  normalize = True)
+
 
 # I reimplemented much of the uncertainty logic since the method in mrcal 2.4,
 # and I want to make sure that the new implementation doesn't break anything.
@@ -458,35 +461,29 @@ if args.compare_baseline_against_mrcal_2_4:
         else:
             raise Exception(f"Given --compare-baseline-against-mrcal-2.4, but an unknown scenario requested: {args.Ncameras=}")
 
-        for icam in range(args.Ncameras):
-
-            model = models_baseline[icam]
-
-            # At 1.0m out
-            p_cam_baseline = mrcal.unproject( q0_baseline, *model.intrinsics(),
-                                              normalize = True)
-
-            Var_dq = \
-                mrcal.projection_uncertainty( p_cam_baseline * 1.0,
-                                              model = model,
-                                              atinfinity = False,
-                                              method     = 'mean-pcam',
-                                              observed_pixel_uncertainty = args.observed_pixel_uncertainty)
-            Var_dq_inf = \
-                mrcal.projection_uncertainty( p_cam_baseline * 1.0,
-                                              model = model,
-                                              atinfinity = True,
-                                              method     = 'mean-pcam',
-                                              observed_pixel_uncertainty = args.observed_pixel_uncertainty )
-
-            testutils.confirm_equal(Var_dq, Var_dq_ref[icam],
-                                    eps = 1e-6,
-                                    worstcase = True,
-                                    msg = f"var(dq) for camera {icam}/{args.Ncameras} matches the legacy implementation in mrcal 2.4")
-            testutils.confirm_equal(Var_dq_inf, Var_dq_inf_ref[icam],
-                                    eps = 1e-6,
-                                    worstcase = True,
-                                    msg = f"var(dq) at infinity for camera {icam}/{args.Ncameras} matches the legacy implementation in mrcal 2.4")
+        # All the cameras are evaluated in one call, and compared in one check.
+        # At 1.0m out
+        Var_dq = \
+            mrcal.projection_uncertainty( v0_cam_baseline * 1.0,
+                                          model = models_baseline,
+                                          atinfinity = False,
+                                          method     = 'mean-pcam',
+                                          observed_pixel_uncertainty = args.observed_pixel_uncertainty)
+        Var_dq_inf = \
+            mrcal.projection_uncertainty( v0_cam_baseline * 1.0,
+                                          model = models_baseline,
+                                          atinfinity = True,
+                                          method     = 'mean-pcam',
+                                          observed_pixel_uncertainty = args.observed_pixel_uncertainty )
+
+        testutils.confirm_equal(Var_dq, Var_dq_ref,
+                                eps = 1e-6,
+                                worstcase = True,
+                                msg = f"var(dq) for all {args.Ncameras} cameras matches the legacy implementation in mrcal 2.4")
+        testutils.confirm_equal(Var_dq_inf, Var_dq_inf_ref,
+                                eps = 1e-6,
+                                worstcase = True,
+                                msg = f"var(dq) at infinity for all {args.Ncameras} cameras matches the legacy implementation in mrcal 2.4")
 
         testutils.finish()
         sys.exit()
@@ -624,13 +621,6 @@ if args.make_documentation_plots is not None:
 
 
 
-# These are at the no-noise-but-with-regularization optimum
-intrinsics_baseline         = nps.cat( *[m.intrinsics()[1]         for m in models_baseline] )
-extrinsics_baseline_mounted = nps.cat( *[m.extrinsics_rt_fromref() for m in models_baseline] )
-frames_baseline             = optimization_inputs_baseline['frames_rt_toref']
-points_baseline             = optimization_inputs_baseline['points']
-calobject_warp_baseline     = optimization_inputs_baseline['calobject_warp']
-
 if args.write_models:
     for i in range(args.Ncameras):
         filename = f"/tmp/models-true-camera{i}.cameramodel"
@@ -695,6 +685,11 @@ def reproject_perturbed__common(q, distance,
     Here I reproject the same q into all N cameras at the same time. I.e. this
     is looking at Ncameras separate uncertainty computations at once
 
+    The leading ... dimensions (the samples) are broadcast inside the mrcal C
+    routines. Each transform_point_rt() and project() call here is one C loop
+    over all the samples, so there's no need to flatten the inputs or to loop
+    over the samples in Python
+
     '''
 
     if not (baseline_points is None or baseline_points.size == 0) or \
@@ -831,22 +826,21 @@ def reproject_perturbed__fit_boards_ref(q, distance,
 
     calobject_height,calobject_width = baseline_optimization_inputs['observations_board'].shape[1:3]
 
-    # shape (Nsamples, Nh, Nw, 3)
-    if query_calobject_warp.ndim > 1:
-        calibration_object_query = \
-            nps.cat(*[ mrcal.ref_calibration_object(calobject_width, calobject_height,
-                                                    baseline_optimization_inputs['calibration_object_spacing'],
-                                                    calobject_warp=calobject_warp) \
-                       for calobject_warp in query_calobject_warp] )
-    else:
-        calibration_object_query = \
-            mrcal.ref_calibration_object(calobject_width, calobject_height,
-                                         baseline_optimization_inputs['calibration_object_spacing'],
-                                         calobject_warp=query_calobject_warp)
+    # shape (Nsamples, Nh, Nw, 3) if we have a leading sample dimension in
+    # query_calobject_warp; (Nh, Nw, 3) otherwise. ref_calibration_object()
+    # broadcasts over calobject_warp
+    calibration_object_query = \
+        mrcal.ref_calibration_object(calobject_width, calobject_height,
+                                     baseline_optimization_inputs['calibration_object_spacing'],
+                                     calobject_warp=query_calobject_warp)
 
+    # Each frame transform is applied to all Nh*Nw corners. I convert it to a
+    # rotation matrix once, instead of evaluating the Rodrigues rotation for
+    # each corner
+    #
     # shape (Nsamples, Nframes, Nh, Nw, 3)
     pcorners_ref_query = \
-        mrcal.transform_point_rt( nps.dummy(query_rt_ref_frame, -2, -2),
+        mrcal.transform_point_Rt( nps.dummy(mrcal.Rt_from_rt(query_rt_ref_frame), -3, -3),
                                   nps.dummy(calibration_object_query, -4))
 
 
@@ -859,7 +853,7 @@ def reproject_perturbed__fit_boards_ref(q, distance,
 
     # shape (Nframes, Nh, Nw, 3)
     pcorners_ref_baseline = \
-        mrcal.transform_point_rt( nps.dummy(baseline_rt_ref_frame, -2, -2),
+        mrcal.transform_point_Rt( nps.dummy(mrcal.Rt_from_rt(baseline_rt_ref_frame), -3, -3),
                                   calibration_object_baseline)
 
     # shape (Nsamples,4,3)
@@ -2216,7 +2210,9 @@ The rt_refperturbed_ref formulation:
             args.observed_pixel_uncertainty*args.observed_pixel_uncertainty
 
         rt_ref_refperturbed__mean0 = rt_ref_refperturbed - np.mean(rt_ref_refperturbed, axis=-2)
-        var_empirical__rt_ref_refperturbed = np.mean(nps.outer(rt_ref_refperturbed__mean0,rt_ref_refperturbed__mean0), axis=0)
+        var_empirical__rt_ref_refperturbed = \
+            nps.matmult(nps.transpose(rt_ref_refperturbed__mean0),
+                        rt_ref_refperturbed__mean0) / rt_ref_refperturbed__mean0.shape[0]
 
         if 0:
             # I do this more or less below in the confirm_covariances_equal()
@@ -2338,13 +2334,16 @@ for icam in (0,3):
     if icam >= args.Ncameras:
         break
 
-    # I move the extrinsics of a model, write it to disk, and make sure the same
-    # uncertainties come back
+    # I move the extrinsics of a model, write it out, and make sure the same
+    # uncertainties come back. This exercises the same serializer as writing to
+    # disk would, but I don't bother touching the filesystem
     if True:
         model_moved = mrcal.cameramodel(models_baseline[icam])
         model_moved.extrinsics_rt_fromref([1., 2., 3., 4., 5., 6.])
-        model_moved.write(f'{workdir}/out.cameramodel')
-        model_read = mrcal.cameramodel(f'{workdir}/out.cameramodel')
+        f = io.StringIO()
+        model_moved.write(f)
+        f.seek(0)
+        model_read = mrcal.cameramodel(f)
 
         icam_intrinsics_read = model_read.icam_intrinsics()
         icam_extrinsics_read = mrcal.corresponding_icam_extrinsics(icam_intrinsics_read,
@@ -2354,8 +2353,7 @@ for icam in (0,3):
                                 icam_extrinsics_read,
                                 msg = f"corresponding icam_extrinsics reported correctly for camera {icam}")
 
-        p_cam_baseline = mrcal.unproject( q0_baseline, *models_baseline[icam].intrinsics(),
-                                          normalize = True)
+        p_cam_baseline = v0_cam_baseline[icam]
 
         Var_dq_ref = \
             mrcal.projection_uncertainty( p_cam_baseline * 1.0,
@@ -2373,7 +2371,7 @@ for icam in (0,3):
                                 eps = 0.001,
                                 worstcase = True,
                                 relative  = True,
-                                msg = f"var(dq) with full rt matches for camera {icam} after moving, writing to disk, reading from disk")
+                                msg = f"var(dq) with full rt matches for camera {icam} after moving, writing, reading")
 
         Var_dq_inf_ref = \
             mrcal.projection_uncertainty( p_cam_baseline * 1.0,
@@ -2391,7 +2389,7 @@ for icam in (0,3):
                                 eps = 0.001,
                                 worstcase = True,
                                 relative  = True,
-                                msg = f"var(dq) with rotation-only matches for camera {icam} after moving, writing to disk, reading from disk")
+                                msg = f"var(dq) with rotation-only matches for camera {icam} after moving, writing, reading")
 
     # the at-infinity uncertainty should be invariant to point scalings (the
     # real scaling used is infinity). The not-at-infinity uncertainty is NOT
@@ -2496,6 +2494,29 @@ for icam in (0,3):
 
 
 
+# I can compute the uncertainty of all the cameras at once. This should produce
+# the same results as evaluating each camera separately
+if True:
+    for atinfinity in (False,True):
+        Var_dq_all = \
+            mrcal.projection_uncertainty( v0_cam_baseline * 5.0,
+                                          model      = models_baseline,
+                                          atinfinity = atinfinity,
+                                          method     = method,
+                                          observed_pixel_uncertainty = args.observed_pixel_uncertainty )
+        Var_dq_each = \
+            nps.cat(*[ mrcal.projection_uncertainty( v0_cam_baseline[icam] * 5.0,
+                                                     model      = models_baseline[icam],
+                                                     atinfinity = atinfinity,
+                                                     method     = method,
+                                                     observed_pixel_uncertainty = args.observed_pixel_uncertainty ) \
+                       for icam in range(args.Ncameras) ])
+        testutils.confirm_equal(Var_dq_all, Var_dq_each,
+                                eps = 1e-6,
+                                worstcase = True,
+                                relative  = True,
+                                msg = f"var(dq) computed for all the cameras at once matches the per-camera results; {atinfinity=}")
+
 if not args.do_sample:
     testutils.finish()
     sys.exit()
@@ -2542,12 +2563,11 @@ def check_uncertainties_at(q0_baseline, idistance):
         distancestr = str(distance)
 
     # shape (Ncameras,3)
-    p_cam_baseline = mrcal.unproject(q0_baseline, lensmodel, intrinsics_baseline,
-                                     normalize = True)
+    #
     # if we're at infinity, I leave p_cam_baseline as a unit vector. This will
     # make bugs with improper at-infinity handling more apparent
-    if not atinfinity:
-        p_cam_baseline *= distance
+    if not atinfinity: p_cam_baseline = v0_cam_baseline * distance
+    else:              p_cam_baseline = v0_cam_baseline
 
     # shape (Nsamples, Ncameras, 2)
     q_sampled = \
@@ -2574,19 +2594,26 @@ def check_uncertainties_at(q0_baseline, idistance):
     # shape (Ncameras, 2)
     q_sampled_mean = np.mean(q_sampled, axis=-3)
 
+    # shape (Nsamples, Ncameras, 2)
+    dq_sampled = q_sampled - q_sampled_mean
+
+    # shape (Ncameras, Nsamples, 2)
+    dq_sampled = nps.mv(dq_sampled, -3,-2)
+
     # shape (Ncameras, 2,2)
-    Var_dq_observed = np.mean( nps.outer(q_sampled-q_sampled_mean,
-                                         q_sampled-q_sampled_mean), axis=-4 )
+    #
+    # This is mean(outer(dq,dq)), but computed as a (2,Nsamples)x(Nsamples,2)
+    # matrix product for each camera, without the (Nsamples,Ncameras,2,2)
+    # temporary
+    Var_dq_observed = nps.matmult(nps.transpose(dq_sampled), dq_sampled) / dq_sampled.shape[-2]
 
     # shape (Ncameras, 2,2)
     Var_dq_predicted = \
-        nps.cat(*[ mrcal.projection_uncertainty( \
-            p_cam_baseline[icam],
-            atinfinity = atinfinity,
-            method     = method,
-            model      = models_baseline[icam],
-            observed_pixel_uncertainty = args.observed_pixel_uncertainty) \
-                   for icam in range(args.Ncameras) ])
+        mrcal.projection_uncertainty( p_cam_baseline,
+                                      atinfinity = atinfinity,
+                                      method     = method,
+                                      model      = models_baseline,
+                                      observed_pixel_uncertainty = args.observed_pixel_uncertainty)
 
     # q_sampled should be evenly distributed around q0_baseline. I can make eps
     # as tight as I want by increasing Nsamples
@@ -253,8 +253,11 @@ if 1:
 p,x,j,f = mrcal.optimizer_callback(**optimization_inputs)
 
 
-import IPython
-IPython.embed()
+# The checks aren't written yet. Drop into a shell only if asked, so that an
+# unattended run doesn't sit in IPython
+if '--explore' in sys.argv[1:]:
+    import IPython
+    IPython.embed()
 sys.exit()
 
 
@@ -185,10 +185,14 @@ pointscale[""] = 1.
 
 
 
+re_terminal_size = re.compile("(.*)( size.*?,)([0-9.]+)(.*?)$")
+re_unsafe_chars  = re.compile(r"[^0-9a-zA-Z_\.\-]")
+re_terminal_font = re.compile('font ",([0-9]+)"')
+
 def shorter_terminal(t):
     # Adjust the terminal string to be less tall. Makes the multiplots look
     # better: less wasted space
-    m = re.match("(.*)( size.*?,)([0-9.]+)(.*?)$", t)
+    m = re_terminal_size.match(t)
     if m is None: return t
     return m.group(1) + m.group(2) + str(float(m.group(3))*0.8) + m.group(4)
 
@@ -196,7 +200,7 @@ if args.make_documentation_plots:
 
     d,f = os.path.split(args.make_documentation_plots)
     args.make_documentation_plots_extratitle = f
-    args.make_documentation_plots_path = os.path.join(d, re.sub(r"[^0-9a-zA-Z_\.\-]", "_", f))
+    args.make_documentation_plots_path = os.path.join(d, re_unsafe_chars.sub("_", f))
 
     print(f"Will write documentation plots to {args.make_documentation_plots_path}-xxxx.pdf and .png and .svg")
 
@@ -262,11 +266,6 @@ Npoints = p_triangulated_true0.shape[0]
 
 
 
-@nps.broadcast_define( (('Nintrinsics',),('Nintrinsics',),
-                        (6,),(6,),(6,),
-                        ('Nframes',6), ('Nframes',6),
-                        ('Npoints',2,2)),
-                       ('Npoints',3))
 def triangulate_nograd( intrinsics_data0, intrinsics_data1,
                         rt_cam0_ref, rt_cam0_ref_baseline, rt_cam1_ref,
                         rt_ref_frame,
@@ -274,23 +273,40 @@ def triangulate_nograd( intrinsics_data0, intrinsics_data1,
                         q,
                         lensmodel,
                         stabilize_coords = True):
+    r'''Triangulate the points observed in q
+
+All the mrcal primitives used here broadcast, so this function broadcasts too,
+without any Python loops. The shapes of the arguments:
+
+- intrinsics_data0, intrinsics_data1:             (..., Nintrinsics)
+- rt_cam0_ref, rt_cam0_ref_baseline, rt_cam1_ref: (..., 6)
+- rt_ref_frame, rt_ref_frame_baseline:            (..., Nframes,6)
+- q:                                              (..., Npoints,2,2)
+
+Returns an array of shape (..., Npoints,3)
+
+    '''
 
     q = nps.atleast_dims(q,-3)
 
-    rt01 = mrcal.compose_rt(rt_cam0_ref,
-                                     mrcal.invert_rt(rt_cam1_ref))
+    # The per-calibration quantities get a new axis to broadcast across the
+    # Npoints axis of q
+    # shape (...,1,6)
+    rt01 = nps.dummy(mrcal.compose_rt(rt_cam0_ref,
+                                      mrcal.invert_rt(rt_cam1_ref)),
+                     -2)
 
-    # all the v have shape (...,3)
+    # all the v have shape (...,Npoints,3)
     vlocal0 = \
         mrcal.unproject(q[...,0,:],
-                        lensmodel, intrinsics_data0)
+                        lensmodel, nps.dummy(intrinsics_data0,-2))
     vlocal1 = \
         mrcal.unproject(q[...,1,:],
-                        lensmodel, intrinsics_data1)
+                        lensmodel, nps.dummy(intrinsics_data1,-2))
 
     v0 = vlocal0
     v1 = \
-        mrcal.rotate_point_r(rt01[:3], vlocal1)
+        mrcal.rotate_point_r(rt01[...,:3], vlocal1)
 
     # The triangulated point in the perturbed camera-0 coordinate system.
     # Calibration-time perturbations move this coordinate system, so to get
@@ -298,9 +314,9 @@ def triangulate_nograd( intrinsics_data0, intrinsics_data1,
     # transform this to the original camera-0 coordinate system; the
     # stabilization path below does that.
     #
-    # shape (..., 3)
+    # shape (..., Npoints,3)
     p_triangulated0 = \
-        mrcal.triangulate_leecivera_mid2(v0, v1, rt01[3:])
+        mrcal.triangulate_leecivera_mid2(v0, v1, rt01[...,3:])
 
     if not stabilize_coords:
         return p_triangulated0
@@ -316,29 +332,47 @@ def triangulate_nograd( intrinsics_data0, intrinsics_data1,
 
     p_cam0_perturbed = p_triangulated0
 
-    p_ref_perturbed = mrcal.transform_point_rt(rt_cam0_ref, p_cam0_perturbed,
+    p_ref_perturbed = mrcal.transform_point_rt(nps.dummy(rt_cam0_ref,-2),
+                                               p_cam0_perturbed,
                                                inverted = True)
 
-    # shape (..., Nframes, 3)
+    if rt_ref_frame is rt_ref_frame_baseline:
+        # The noiseless sanity checks pass the same frames twice. Going to the
+        # frame coords and back is then the identity, so I skip it
+        return mrcal.transform_point_rt(nps.dummy(rt_cam0_ref_baseline,-2),
+                                        p_ref_perturbed)
+
+    # The frame poses don't depend on the points, so I convert them to Rt once
+    # here. Otherwise transform_point_rt() would recompute the same rotation
+    # matrices for each point
+    # shape (..., 1,Nframes,4,3)
+    Rt_ref_frame          = nps.dummy(mrcal.Rt_from_rt(rt_ref_frame),          -4)
+    Rt_ref_frame_baseline = nps.dummy(mrcal.Rt_from_rt(rt_ref_frame_baseline), -4)
+
+    # shape (..., Npoints,Nframes,3)
     p_frames = \
-        mrcal.transform_point_rt(rt_ref_frame,
+        mrcal.transform_point_Rt(Rt_ref_frame,
                                  nps.dummy(p_ref_perturbed,-2),
                                  inverted = True)
 
-    # shape (..., Nframes, 3)
-    p_ref_baseline_all = mrcal.transform_point_rt(rt_ref_frame_baseline, p_frames)
+    # shape (..., Npoints,Nframes,3)
+    p_ref_baseline_all = mrcal.transform_point_Rt(Rt_ref_frame_baseline,
+                                                  p_frames)
 
-    # shape (..., 3)
+    # shape (..., Npoints,3)
     p_ref_baseline = np.mean(p_ref_baseline_all, axis=-2)
 
-    # shape (..., 3)
-    return mrcal.transform_point_rt(rt_cam0_ref_baseline, p_ref_baseline)
+    # shape (..., Npoints,3)
+    return mrcal.transform_point_rt(nps.dummy(rt_cam0_ref_baseline,-2),
+                                    p_ref_baseline)
 
 
 
 ################# Sampling
 cache_id = f"{args.fixed}-{args.model}-{args.Nframes}-{args.Nsamples}-{args.Ncameras}-{args.cameras[0]}-{args.cameras[1]}-{1 if args.stabilize_coords else 0}-{args.q_calibration_stdev}-{args.q_observation_stdev}-{args.q_observation_stdev_correlation}"
-cache_file = f"/tmp/test-triangulation-uncertainty--{cache_id}.pickle"
+# The large sampled arrays are stored separately, in an .npz file
+cache_file     = f"/tmp/test-triangulation-uncertainty--{cache_id}.pickle"
+cache_file_npz = f"/tmp/test-triangulation-uncertainty--{cache_id}.npz"
 
 if args.cache is None or args.cache == 'write':
     optimization_inputs_baseline, \
@@ -368,11 +402,18 @@ else:
          lensmodel,
          Nintrinsics,
          imagersizes,
-         frames_true,
-         intrinsics_sampled,
-         extrinsics_sampled_mounted,
-         frames_sampled,
-         calobject_warp_sampled) = pickle.load(f)
+         frames_true) = pickle.load(f)
+    with np.load(cache_file_npz) as f:
+        # Any of these could be None, in which case it wasn't written
+        intrinsics_sampled,         \
+        extrinsics_sampled_mounted, \
+        frames_sampled,             \
+        calobject_warp_sampled =    \
+            [ f[k] if k in f else None \
+              for k in ('intrinsics_sampled',
+                        'extrinsics_sampled_mounted',
+                        'frames_sampled',
+                        'calobject_warp_sampled') ]
 
 
 models_baseline = \
@@ -395,11 +436,10 @@ p_triangulated_true_local = nps.xchg( nps.cat( p_triangulated_true0,
 
 # Pixel coords at the perfect intersection
 # shape (Npoints,Ncameras,2)
-q_true = nps.xchg( np.array([ mrcal.project(p_triangulated_true_local[:,i,:],
-                                            lensmodel,
-                                            models_true[args.cameras[i]].intrinsics()[1]) \
-                            for i in range(2)]),
-                 0,1)
+q_true = mrcal.project(p_triangulated_true_local,
+                       lensmodel,
+                       nps.cat(models_true[icam0].intrinsics()[1],
+                               models_true[icam1].intrinsics()[1]))
 
 # Sanity check. Without noise, the triangulation should report the test point exactly
 p_triangulated0 = \
@@ -454,66 +494,80 @@ istate_e1 =              \
                                                             stabilize_coords = args.stabilize_coords)
 
 ########## Gradient check
-dp_triangulated_di0_empirical = grad(lambda i0: triangulate_nograd(i0, models_baseline[icam1].intrinsics()[1],
-                                                                   models_baseline[icam0].extrinsics_rt_fromref(),
-                                                                   models_baseline[icam0].extrinsics_rt_fromref(),
-                                                                   models_baseline[icam1].extrinsics_rt_fromref(),
+# triangulate_nograd() broadcasts, so each of these evaluates all the
+# perturbations with a single call. The baseline parameters are shared by all
+# of these, so I query the models once
+intrinsics0_baseline = models_baseline[icam0].intrinsics()[1]
+intrinsics1_baseline = models_baseline[icam1].intrinsics()[1]
+rt_cam0_ref_baseline = models_baseline[icam0].extrinsics_rt_fromref()
+rt_cam1_ref_baseline = models_baseline[icam1].extrinsics_rt_fromref()
+
+dp_triangulated_di0_empirical = grad(lambda i0: triangulate_nograd(i0, intrinsics1_baseline,
+                                                                   rt_cam0_ref_baseline,
+                                                                   rt_cam0_ref_baseline,
+                                                                   rt_cam1_ref_baseline,
                                                                    baseline_rt_ref_frame, baseline_rt_ref_frame,
                                                                    q_true,
                                                                    lensmodel,
                                                                    stabilize_coords=args.stabilize_coords),
-                                     models_baseline[icam0].intrinsics()[1],
-                                     step = 1e-5)
-dp_triangulated_di1_empirical = grad(lambda i1: triangulate_nograd(models_baseline[icam0].intrinsics()[1],i1,
-                                                                   models_baseline[icam0].extrinsics_rt_fromref(),
-                                                                   models_baseline[icam0].extrinsics_rt_fromref(),
-                                                                   models_baseline[icam1].extrinsics_rt_fromref(),
+                                     intrinsics0_baseline,
+                                     step       = 1e-5,
+                                     vectorized = True)
+dp_triangulated_di1_empirical = grad(lambda i1: triangulate_nograd(intrinsics0_baseline,i1,
+                                                                   rt_cam0_ref_baseline,
+                                                                   rt_cam0_ref_baseline,
+                                                                   rt_cam1_ref_baseline,
                                                                    baseline_rt_ref_frame, baseline_rt_ref_frame,
                                                                    q_true,
                                                                    lensmodel,
                                                                    stabilize_coords=args.stabilize_coords),
-                                     models_baseline[icam1].intrinsics()[1])
-dp_triangulated_de1_empirical = grad(lambda e1: triangulate_nograd(models_baseline[icam0].intrinsics()[1], models_baseline[icam1].intrinsics()[1],
-                                                                   models_baseline[icam0].extrinsics_rt_fromref(),
-                                                                   models_baseline[icam0].extrinsics_rt_fromref(),
+                                     intrinsics1_baseline,
+                                     vectorized = True)
+dp_triangulated_de1_empirical = grad(lambda e1: triangulate_nograd(intrinsics0_baseline, intrinsics1_baseline,
+                                                                   rt_cam0_ref_baseline,
+                                                                   rt_cam0_ref_baseline,
                                                                    e1,
                                                                    baseline_rt_ref_frame, baseline_rt_ref_frame,
                                                                    q_true,
                                                                    lensmodel,
                                                                    stabilize_coords=args.stabilize_coords),
-                                     models_baseline[icam1].extrinsics_rt_fromref())
+                                     rt_cam1_ref_baseline,
+                                     vectorized = True)
 
-dp_triangulated_de0_empirical = grad(lambda e0: triangulate_nograd(models_baseline[icam0].intrinsics()[1], models_baseline[icam1].intrinsics()[1],
+dp_triangulated_de0_empirical = grad(lambda e0: triangulate_nograd(intrinsics0_baseline, intrinsics1_baseline,
                                                                    e0,
-                                                                   models_baseline[icam0].extrinsics_rt_fromref(),
-                                                                   models_baseline[icam1].extrinsics_rt_fromref(),
+                                                                   rt_cam0_ref_baseline,
+                                                                   rt_cam1_ref_baseline,
                                                                    baseline_rt_ref_frame, baseline_rt_ref_frame,
                                                                    q_true,
                                                                    lensmodel,
                                                                    stabilize_coords=args.stabilize_coords),
-                                     models_baseline[icam0].extrinsics_rt_fromref())
+                                     rt_cam0_ref_baseline,
+                                     vectorized = True)
 
-dp_triangulated_drtrf_empirical = grad(lambda rtrf: triangulate_nograd(models_baseline[icam0].intrinsics()[1], models_baseline[icam1].intrinsics()[1],
-                                                                       models_baseline[icam0].extrinsics_rt_fromref(),
-                                                                       models_baseline[icam0].extrinsics_rt_fromref(),
-                                                                       models_baseline[icam1].extrinsics_rt_fromref(),
+dp_triangulated_drtrf_empirical = grad(lambda rtrf: triangulate_nograd(intrinsics0_baseline, intrinsics1_baseline,
+                                                                       rt_cam0_ref_baseline,
+                                                                       rt_cam0_ref_baseline,
+                                                                       rt_cam1_ref_baseline,
                                                                        rtrf, baseline_rt_ref_frame,
                                                                        q_true,
                                                                        lensmodel,
                                                                        stabilize_coords=args.stabilize_coords),
                                        baseline_rt_ref_frame,
-                                       step = 1e-5)
+                                       step       = 1e-5,
+                                       vectorized = True)
 
-dp_triangulated_dq_empirical = grad(lambda q: triangulate_nograd(models_baseline[icam0].intrinsics()[1], models_baseline[icam1].intrinsics()[1],
-                                                                 models_baseline[icam0].extrinsics_rt_fromref(),
-                                                                 models_baseline[icam0].extrinsics_rt_fromref(),
-                                                                 models_baseline[icam1].extrinsics_rt_fromref(),
+dp_triangulated_dq_empirical = grad(lambda q: triangulate_nograd(intrinsics0_baseline, intrinsics1_baseline,
+                                                                 rt_cam0_ref_baseline,
+                                                                 rt_cam0_ref_baseline,
+                                                                 rt_cam1_ref_baseline,
                                                                  baseline_rt_ref_frame, baseline_rt_ref_frame,
                                                                  q,
                                                                  lensmodel,
                                                                  stabilize_coords=args.stabilize_coords),
                                     q_true,
-                                    step = 1e-3)
+                                    step       = 1e-3,
+                                    vectorized = True)
 
 testutils.confirm_equal(dp_triangulated_dbstate[...,istate_i0:istate_i0+Nintrinsics],
                         dp_triangulated_di0_empirical,
@@ -555,16 +609,19 @@ if optimization_inputs_baseline.get('do_optimize_frames'):
 
 # dp_triangulated_dq_empirical has shape (Npoints,3,  Npoints,Ncameras,2)
 # The cross terms (p_triangulated(point=A), q(point=B)) should all be zero
+#
+# I pull out the diagonal blocks (p_triangulated(point=A), q(point=A)) with one
+# fancy index. This makes a copy, so I can then zero them out
+ipts = np.arange(Npoints)
 dp_triangulated_dq_empirical_cross_only = dp_triangulated_dq_empirical
-dp_triangulated_dq_empirical = np.zeros((Npoints,3,2,2), dtype=float)
+# shape (Npoints,3,2,2)
+dp_triangulated_dq_empirical = dp_triangulated_dq_empirical_cross_only[ipts,:,ipts,:,:]
+dp_triangulated_dq_empirical_cross_only[ipts,:,ipts,:,:] = 0
 
 dp_triangulated_dq = np.zeros((Npoints,3,2,2), dtype=float)
 dp_triangulated_dq_flattened = nps.clump(dp_triangulated_dq, n=-2)
 
 for ipt in range(Npoints):
-    dp_triangulated_dq_empirical[ipt,...] = dp_triangulated_dq_empirical_cross_only[ipt,:,ipt,:,:]
-    dp_triangulated_dq_empirical_cross_only[ipt,:,ipt,:,:] = 0
-
     p = np.zeros((3,), dtype=float)
     dp_triangulated_dq_flattened[ipt] = \
         mrcal.triangulation._triangulate_grad_simple(*slices[ipt], p)
@@ -665,23 +722,28 @@ if not did_sample:
           calibration_sample( args.Nsamples,
                               optimization_inputs_baseline,
                               args.q_calibration_stdev,
-                              fixedframes)
+                              fixedframes,
+                              Nprocesses = os.cpu_count())
 
     if args.cache is not None and args.cache == 'write':
         with open(cache_file,"wb") as f:
             pickle.dump((optimization_inputs_baseline,
                          models_true,
-                         models_baseline,
                          lensmodel,
                          Nintrinsics,
                          imagersizes,
-                         frames_true,
-                         intrinsics_sampled,
-                         extrinsics_sampled_mounted,
-                         frames_sampled,
-                         calobject_warp_sampled),
-                        f)
-        print(f"Wrote cache to {cache_file}")
+                         frames_true),
+                        f,
+                        protocol = pickle.HIGHEST_PROTOCOL)
+        # The large sampled arrays are written raw, without going through
+        # pickle
+        np.savez(cache_file_npz,
+                 **{ k:v for k,v in (('intrinsics_sampled',         intrinsics_sampled),
+                                     ('extrinsics_sampled_mounted', extrinsics_sampled_mounted),
+                                     ('frames_sampled',             frames_sampled),
+                                     ('calobject_warp_sampled',     calobject_warp_sampled)) \
+                     if v is not None })
+        print(f"Wrote cache to {cache_file} and {cache_file_npz}")
 
 
 
@@ -691,17 +753,33 @@ if not did_sample:
 var_qt_onepoint = \
     mrcal.triangulation._compute_Var_q_triangulation(args.q_observation_stdev,
                                                      args.q_observation_stdev_correlation)
-var_qt = np.zeros((Npoints*2*2, Npoints*2*2), dtype=float)
-for i in range(Npoints):
-    var_qt[4*i:4*(i+1), 4*i:4*(i+1)] = var_qt_onepoint
+# The observation noise is independent between points, so var_qt is
+# block-diagonal, with one (4,4) block per point. I store just the blocks
+# shape (Npoints,4,4)
+var_qt_blocks = np.broadcast_to(var_qt_onepoint, (Npoints,4,4))
 # I want the RNG to be deterministic. If I turn caching on/off I'd be at a
 # different place in the RNG here. I reset to keep things consistent
 np.random.seed(0)
-qt_noise = \
-    np.random.multivariate_normal( mean = np.zeros((Npoints*2*2,),),
-                                   cov  = var_qt,
-                                   size = args.Nsamples ).reshape(args.Nsamples,Npoints,2,2)
-q_sampled = q_true + qt_noise
+# I write the noise directly into q_sampled, and then add q_true to it in place
+# shape (Nsamples,Npoints,2,2)
+q_sampled = np.empty((args.Nsamples,Npoints,2,2), dtype=float)
+# A view into q_sampled
+# shape (Nsamples,Npoints,4)
+qt_noise  = q_sampled.reshape(args.Nsamples,Npoints,4)
+if args.q_observation_stdev_correlation == 0:
+    # var_qt_blocks = stdev^2 I: the noise is just scaled standard normals
+    qt_noise[...] = np.random.randn(args.Nsamples,Npoints,4)
+    qt_noise *= args.q_observation_stdev
+else:
+    # I sample each point independently: qt_noise = L z where L Lt = var_qt
+    # and z ~ N(0,I). I factor the blocks with eigh() instead of cholesky():
+    # the blocks are singular if the correlation is 1
+    l,v = np.linalg.eigh(var_qt_blocks)
+    L   = v * nps.dummy(np.sqrt(np.maximum(l,0)), -2)
+    z   = np.random.randn(args.Nsamples,Npoints,4)
+    nps.matmult(L, nps.dummy(z,-1),
+                out = nps.dummy(qt_noise,-1))
+q_sampled += q_true
 
 
 # I have the perfect observation pixel coords. I triangulate them through my
@@ -734,22 +812,15 @@ Var_ranges_sampled  = ranges_sampled.var(  axis = -1)
 # dr_dp = p/r
 # Var(r) = dr_dp var(p) dr_dpT
 #        = p var(p) pT / norm2(p)
-Var_ranges_joint        = np.zeros((Npoints,), dtype=float)
-Var_ranges_calibration  = np.zeros((Npoints,), dtype=float)
-Var_ranges_observations = np.zeros((Npoints,), dtype=float)
-for ipt in range(Npoints):
-    Var_ranges_joint[ipt] = \
-        nps.matmult(p_triangulated0[ipt],
-                    Var_p_joint[ipt,:,ipt,:],
-                    nps.transpose(p_triangulated0[ipt]))[0] / nps.norm2(p_triangulated0[ipt])
-    Var_ranges_calibration[ipt] = \
-        nps.matmult(p_triangulated0[ipt],
-                    Var_p_calibration[ipt,:,ipt,:],
-                    nps.transpose(p_triangulated0[ipt]))[0] / nps.norm2(p_triangulated0[ipt])
-    Var_ranges_observations[ipt] = \
-        nps.matmult(p_triangulated0[ipt],
-                    Var_p_observation[ipt,:,:],
-                    nps.transpose(p_triangulated0[ipt]))[0] / nps.norm2(p_triangulated0[ipt])
+#
+# I evaluate this for all the points at once: Var_p has shape (Npoints,3,3)
+def Var_ranges(Var_p):
+    return nps.matmult(nps.dummy(p_triangulated0,-2),
+                       Var_p,
+                       nps.dummy(p_triangulated0,-1))[...,0,0] / nps.norm2(p_triangulated0)
+Var_ranges_joint        = Var_ranges(Var_p_joint      [ipts,:,ipts,:])
+Var_ranges_calibration  = Var_ranges(Var_p_calibration[ipts,:,ipts,:])
+Var_ranges_observations = Var_ranges(Var_p_observation)
 
 
 diff                  = p_triangulated0[1] - p_triangulated0[0]
@@ -763,9 +834,12 @@ Var_distance_sampled  = distance_sampled.var()
 # ddist_dp01 = [-diff   diff] / dist
 # Var(dist) = ddist_dp01 var(p01) ddist_dp01T
 #           = [-diff   diff] var(p01) [-diff   diff]T / norm2(diff)
-Var_distance = nps.matmult(nps.glue( -diff, diff, axis=-1),
-                           Var_p_joint.reshape(Npoints*3,Npoints*3),
-                           nps.transpose(nps.glue( -diff, diff, axis=-1),))[0] / nps.norm2(diff)
+#
+# shape (Npoints*3,)
+ddist_dp01_unnormalized = nps.glue( -diff, diff, axis=-1)
+Var_distance = nps.inner(nps.matmult(ddist_dp01_unnormalized,
+                                     Var_p_joint.reshape(Npoints*3,Npoints*3)),
+                         ddist_dp01_unnormalized) / nps.norm2(diff)
 
 
 
@@ -819,15 +893,15 @@ if args.make_documentation_plots is not None:
         [ mrcal.utils._plot_args_points_and_covariance_ellipse(p_triangulated_sampled0[:,ipt,(0,2)],
                                                                'Observed') \
           for ipt in range(Npoints) ]
-    # Individual covariances
-    Var_p_joint_diagonal = [Var_p_joint[ipt,:,ipt,:][(0,2),:][:,(0,2)] \
-                               for ipt in range(Npoints)]
-    Var_p_calibration_diagonal = [Var_p_calibration[ipt,:,ipt,:][(0,2),:][:,(0,2)] \
-                                     for ipt in range(Npoints)]
-    Var_p_observation_diagonal = [Var_p_observation[ipt,:,:][(0,2),:][:,(0,2)] \
-                                      for ipt in range(Npoints)]
-
-    max_sigma_points = np.array([ np.max(np.sqrt(np.linalg.eig(V)[0])) for V in Var_p_joint_diagonal ])
+    # Individual covariances of the (x,z) coordinates
+    # shape (Npoints,2,2)
+    Var_p_joint_diagonal       = Var_p_joint      [ipts,:,ipts,:][:,(0,2),:][:,:,(0,2)]
+    Var_p_calibration_diagonal = Var_p_calibration[ipts,:,ipts,:][:,(0,2),:][:,:,(0,2)]
+    Var_p_observation_diagonal = Var_p_observation[:,   (0,2),:][:,:,(0,2)]
+
+    # The covariances are symmetric, so I use eigvalsh(). It returns the
+    # eigenvalues in ascending order, so the last one is the largest
+    max_sigma_points = np.sqrt(np.linalg.eigvalsh(Var_p_joint_diagonal)[:,-1])
     max_sigma = np.max(max_sigma_points)
 
     if args.ellipse_plot_radius is not None:
@@ -871,7 +945,45 @@ if args.make_documentation_plots is not None:
                   if p is not None ] \
                  for ipt in range(Npoints) ]
 
-    def makeplots(dohardcopy, processoptions_base):
+    # The histogram fits don't depend on the output format, so I compute them
+    # once, instead of in each makeplots() call
+    binwidth_range0 = np.sqrt(Var_ranges_joint[0]) / 4.
+    equation_range0_observed_gaussian = \
+        mrcal.fitted_gaussian_equation(x        = ranges_sampled[0],
+                                       binwidth = binwidth_range0,
+                                       legend   = "Idealized gaussian fit to data")
+    equation_range0_predicted_joint_gaussian = \
+        mrcal.fitted_gaussian_equation(mean     = ranges[0],
+                                       sigma    = np.sqrt(Var_ranges_joint[0]),
+                                       N        = len(ranges_sampled[0]),
+                                       binwidth = binwidth_range0,
+                                       legend   = "Predicted-joint")
+    equation_range0_predicted_calibration_gaussian = \
+        mrcal.fitted_gaussian_equation(mean     = ranges[0],
+                                       sigma    = np.sqrt(Var_ranges_calibration[0]),
+                                       N        = len(ranges_sampled[0]),
+                                       binwidth = binwidth_range0,
+                                       legend   = "Predicted-calibration")
+    equation_range0_predicted_observations_gaussian = \
+        mrcal.fitted_gaussian_equation(mean     = ranges[0],
+                                       sigma    = np.sqrt(Var_ranges_observations[0]),
+                                       N        = len(ranges_sampled[0]),
+                                       binwidth = binwidth_range0,
+                                       legend   = "Predicted-observations")
+    binwidth_distance = np.sqrt(Var_distance) / 4.
+    equation_distance_observed_gaussian = \
+        mrcal.fitted_gaussian_equation(x        = distance_sampled,
+                                       binwidth = binwidth_distance,
+                                       legend   = "Idealized gaussian fit to data")
+    equation_distance_predicted_gaussian = \
+        mrcal.fitted_gaussian_equation(mean     = distance,
+                                       sigma    = np.sqrt(Var_distance),
+                                       N        = len(distance_sampled),
+                                       binwidth = binwidth_distance,
+                                       legend   = "Predicted")
+
+    def makeplots(dohardcopy, processoptions_base,
+                  extension = None):
 
         processoptions = copy.deepcopy(processoptions_base)
         gp.add_plot_option(processoptions,
@@ -881,7 +993,7 @@ if args.make_documentation_plots is not None:
 
         # The key should use smaller text than the rest of the plot, if possible
         if 'terminal' in processoptions:
-            m = re.search('font ",([0-9]+)"', processoptions['terminal'])
+            m = re_terminal_font.search(processoptions['terminal'])
             if m is not None:
                 s = int(m.group(1))
 
@@ -924,29 +1036,6 @@ if args.make_documentation_plots is not None:
 
 
         processoptions = copy.deepcopy(processoptions_base)
-        binwidth = np.sqrt(Var_ranges_joint[0]) / 4.
-        equation_range0_observed_gaussian = \
-            mrcal.fitted_gaussian_equation(x        = ranges_sampled[0],
-                                           binwidth = binwidth,
-                                           legend   = "Idealized gaussian fit to data")
-        equation_range0_predicted_joint_gaussian = \
-            mrcal.fitted_gaussian_equation(mean     = ranges[0],
-                                           sigma    = np.sqrt(Var_ranges_joint[0]),
-                                           N        = len(ranges_sampled[0]),
-                                           binwidth = binwidth,
-                                           legend   = "Predicted-joint")
-        equation_range0_predicted_calibration_gaussian = \
-            mrcal.fitted_gaussian_equation(mean     = ranges[0],
-                                           sigma    = np.sqrt(Var_ranges_calibration[0]),
-                                           N        = len(ranges_sampled[0]),
-                                           binwidth = binwidth,
-                                           legend   = "Predicted-calibration")
-        equation_range0_predicted_observations_gaussian = \
-            mrcal.fitted_gaussian_equation(mean     = ranges[0],
-                                           sigma    = np.sqrt(Var_ranges_observations[0]),
-                                           N        = len(ranges_sampled[0]),
-                                           binwidth = binwidth,
-                                           legend   = "Predicted-observations")
         if dohardcopy:
             processoptions['hardcopy'] = \
                 f'{args.make_documentation_plots_path}--range-to-p0.{extension}'
@@ -954,7 +1043,7 @@ if args.make_documentation_plots is not None:
         gp.add_plot_option(processoptions, 'set', 'samples 1000')
         gp.plot(ranges_sampled[0],
                 histogram       = True,
-                binwidth        = binwidth,
+                binwidth        = binwidth_range0,
                 equation_above  = (equation_range0_predicted_joint_gaussian,
                                    equation_range0_predicted_calibration_gaussian,
                                    equation_range0_predicted_observations_gaussian,
@@ -966,17 +1055,6 @@ if args.make_documentation_plots is not None:
             os.system(f"pdfcrop {processoptions['hardcopy']}")
 
         processoptions = copy.deepcopy(processoptions_base)
-        binwidth = np.sqrt(Var_distance) / 4.
-        equation_distance_observed_gaussian = \
-            mrcal.fitted_gaussian_equation(x        = distance_sampled,
-                                           binwidth = binwidth,
-                                           legend   = "Idealized gaussian fit to data")
-        equation_distance_predicted_gaussian = \
-            mrcal.fitted_gaussian_equation(mean     = distance,
-                                           sigma    = np.sqrt(Var_distance),
-                                           N        = len(distance_sampled),
-                                           binwidth = binwidth,
-                                           legend   = "Predicted")
         if dohardcopy:
             processoptions['hardcopy'] = \
                 f'{args.make_documentation_plots_path}--distance-p1-p0.{extension}'
@@ -984,7 +1062,7 @@ if args.make_documentation_plots is not None:
         gp.add_plot_option(processoptions, 'set', 'samples 1000')
         gp.plot(distance_sampled,
                 histogram       = True,
-                binwidth        = binwidth,
+                binwidth        = binwidth_distance,
                 equation_above  = (equation_distance_predicted_gaussian,
                                    equation_distance_observed_gaussian),
                 xlabel          = "Distance between triangulated points (m)",
@@ -998,7 +1076,8 @@ if args.make_documentation_plots is not None:
             makeplots(dohardcopy = True,
                       processoptions_base = dict(wait      = False,
                                                  terminal  = terminal[extension],
-                                                 _set      = extraset[extension]))
+                                                 _set      = extraset[extension]),
+                      extension = extension)
     else:
         makeplots(dohardcopy = False,
                   processoptions_base = dict(wait = True))
@@ -4,6 +4,7 @@ import numpysane as nps
 import copy
 import os
 import re
+import multiprocessing
 
 # I import the LOCAL mrcal since that's what I'm testing
 testdir = os.path.dirname(os.path.realpath(__file__))
@@ -12,13 +13,33 @@ import mrcal
 
 def sample_dqref(observations,
                  pixel_uncertainty_stdev,
-                 make_outliers = False):
+                 make_outliers = False,
+                 *,
+                 rng           = None,
+                 out           = None):
+    r'''Perturb the given observations with gaussian noise
+
+By default the noise comes from the global numpy RNG (seeded with
+np.random.seed()). A numpy.random.Generator may be passed in "rng" instead. If
+"out" is given, the noise is written into it, and it is returned as q_noise.
+This makes it possible to fill a preallocated array of samples directly
+
+    '''
 
     # Outliers have weight < 0. The code will adjust the outlier observations
     # also. But that shouldn't matter: they're outliers so those observations
     # should be ignored
     weight  = observations[...,-1]
-    q_noise = np.random.randn(*observations.shape[:-1], 2) * pixel_uncertainty_stdev / nps.mv(nps.cat(weight,weight),0,-1)
+
+    if out is None:
+        out = np.empty(observations.shape[:-1] + (2,), dtype=float)
+    if rng is None:
+        out[...] = np.random.randn(*observations.shape[:-1], 2)
+    else:
+        rng.standard_normal(out = out)
+    q_noise  = out
+    q_noise *= pixel_uncertainty_stdev
+    q_noise /= nps.dummy(weight,-1)
 
     if make_outliers:
         if not hasattr(sample_dqref, 'idx_outliers_ref_flat'):
@@ -27,7 +48,8 @@ def sample_dqref(observations,
                 np.random.choice( NobservedPoints,
                                   (NobservedPoints//100,), # 1% outliers
                                   replace = False )
-        nps.clump(q_noise, n=3)[sample_dqref.idx_outliers_ref_flat, :] *= 20
+        q_noise[np.unravel_index(sample_dqref.idx_outliers_ref_flat,
+                                 q_noise.shape[:-1])] *= 20
 
     observations_perturbed = observations.copy()
     observations_perturbed[...,:2] += q_noise
@@ -38,7 +60,8 @@ def grad(f, x,
          *,
          switch              = None,
          forward_differences = False,
-         step                = 1e-6):
+         step                = 1e-6,
+         vectorized          = False):
     r'''Computes df/dx at x
 
     f is a function of one argument. If the input has shape Si and the output
@@ -49,6 +72,10 @@ def grad(f, x,
     us to a different mode, giving a falsely-high difference. Use the "switch"
     argument to switch to the other mode in this case.
 
+    If vectorized: f broadcasts across new leading dimensions of its input, and
+    I evaluate all the perturbations of x with one call, instead of calling f
+    for each element of x separately
+
     '''
 
     if switch is not None and not forward_differences:
@@ -57,6 +84,27 @@ def grad(f, x,
     d     = np.zeros(x.shape,dtype=float)
     dflat = d.ravel()
 
+    if vectorized:
+        # shape (Nx,)+Si: each slice perturbs one element of x
+        dx = (np.eye(x.size) * step).reshape((x.size,) + x.shape)
+
+        if not forward_differences:
+            # central differences
+            Jflat = (f(x+dx) - f(x-dx)) / (2.*step)
+        else:
+            # forward differences
+            f0    = f(x)
+            fplus = f(x+dx)
+            if switch is not None:
+                for i in range(len(fplus)):
+                    if nps.norm2((fplus[i]-f0).ravel()) > 1.:
+                        fplus[i] = switch(fplus[i])
+            Jflat = (fplus-f0) / step
+
+        # grad variable is in last dim
+        Jflat = nps.mv(Jflat, 0, -1)
+        return Jflat.reshape( Jflat.shape[:-1] + d.shape )
+
     def df_dxi(i, d,dflat):
 
         if not forward_differences:
@@ -192,21 +240,23 @@ ARGUMENTS
        (moving_cameras or ref_frame0):
         raise Exception("fixedframes only supported in the simple, vanilla case: not moving_cameras and not ref_frame0")
 
+    def models_true_refcam0_from_files(kind):
+        # cameras 0,1 and 2,3 are copies of the same model. I parse each file
+        # once, and copy the parsed model
+        model0 = mrcal.cameramodel(f"{testdir}/data/cam0.{kind}.cameramodel")
+        model1 = mrcal.cameramodel(f"{testdir}/data/cam1.{kind}.cameramodel")
+        return ( model0, mrcal.cameramodel(model0),
+                 model1, mrcal.cameramodel(model1) )
+
     if re.match('opencv',model):
-        models_true_refcam0 = ( mrcal.cameramodel(f"{testdir}/data/cam0.opencv8.cameramodel"),
-                        mrcal.cameramodel(f"{testdir}/data/cam0.opencv8.cameramodel"),
-                        mrcal.cameramodel(f"{testdir}/data/cam1.opencv8.cameramodel"),
-                        mrcal.cameramodel(f"{testdir}/data/cam1.opencv8.cameramodel") )
+        models_true_refcam0 = models_true_refcam0_from_files("opencv8")
 
         if model == 'opencv4':
             # I have opencv8 models_true_refcam0, but I truncate to opencv4 models_true_refcam0
             for m in models_true_refcam0:
                 m.intrinsics( intrinsics = ('LENSMODEL_OPENCV4', m.intrinsics()[1][:8]))
     elif model == 'splined':
-        models_true_refcam0 = ( mrcal.cameramodel(f"{testdir}/data/cam0.splined.cameramodel"),
-                        mrcal.cameramodel(f"{testdir}/data/cam0.splined.cameramodel"),
-                        mrcal.cameramodel(f"{testdir}/data/cam1.splined.cameramodel"),
-                        mrcal.cameramodel(f"{testdir}/data/cam1.splined.cameramodel") )
+        models_true_refcam0 = models_true_refcam0_from_files("splined")
     else:
         raise Exception("Unknown lens being tested")
 
@@ -328,19 +378,15 @@ ARGUMENTS
                             axis=-1),
                    n=2)
 
-    # Dense observations. All the cameras see all the boards
-    indices_frame_camera = np.zeros( (Nframes,Ncameras,2), dtype=np.int32)
-    indices_frame_camera[...,0] += nps.transpose(np.arange(Nframes, dtype=np.int32))
-    indices_frame_camera[...,1] += np.arange(Ncameras, dtype=np.int32)
-    # shape (Nframes*Ncameras, 2)
-    indices_frame_camera = nps.clump(indices_frame_camera, n=2)
+    # Dense observations. All the cameras see all the boards. I fill in the
+    # final table directly
+    # shape (Nframes*Ncameras, 3)
+    indices_frame_camintrinsics_camextrinsics = np.empty((Nframes*Ncameras,3), dtype=np.int32)
+    indices_frame_camintrinsics_camextrinsics[:,0] = np.repeat(np.arange(Nframes,  dtype=np.int32), Ncameras)
+    indices_frame_camintrinsics_camextrinsics[:,1] = np.tile  (np.arange(Ncameras, dtype=np.int32), Nframes)
 
     # stationary cameras, so idxci = idxce
-    # shape (Nframes*Ncameras, 3)
-    indices_frame_camintrinsics_camextrinsics = \
-        nps.glue(indices_frame_camera,
-                 indices_frame_camera[:,(1,)],
-                 axis=-1)
+    indices_frame_camintrinsics_camextrinsics[:,2] = indices_frame_camintrinsics_camextrinsics[:,1]
     if not fixedframes:
         # cam0 is at the reference
         indices_frame_camintrinsics_camextrinsics[:,2] -= 1
@@ -627,11 +673,94 @@ def calibration_boards_to_points(optimization_inputs):
     optimization_inputs['point_max_range'] = 1e12
 
 
+# mrcal.optimize() changes the optimization_inputs in-place: it writes the
+# optimized state into these keys, and it writes the outlier weights into the
+# observations
+_calibration_sample_state_keys = ('intrinsics',
+                                  'extrinsics_rt_fromref',
+                                  'frames_rt_toref',
+                                  'points',
+                                  'calobject_warp')
+_calibration_sample_observation_keys = ('observations_board',
+                                        'observations_point')
+
+def _calibration_sample_optimize(optimization_inputs, function_optimize):
+    r'''Solve one of the calibration_sample() problems
+
+The solve happens in-place. Returns (solved, b_packed). "solved" is a dict of
+everything the solve could have changed, to be applied with
+_calibration_sample_apply(). With mrcal.optimize() this is the solved state
+arrays (see _calibration_sample_state_keys) and the weight columns of the
+observations. These are small, so they're cheap to send back from the worker
+processes. A custom function_optimize could change anything, so in that case
+"solved" is the whole optimization_inputs, and b_packed is None
+
+    '''
+
+    if function_optimize is not None:
+        function_optimize(optimization_inputs)
+        return optimization_inputs, None
+
+    b_packed = mrcal.optimize(**optimization_inputs)['b_packed']
+    mrcal.unpack_state(b_packed, **optimization_inputs)
+
+    solved = dict()
+    solved['state'] = \
+        { k: optimization_inputs[k] \
+          for k in _calibration_sample_state_keys \
+          if optimization_inputs.get(k) is not None }
+    solved['weights'] = \
+        { k: optimization_inputs[k][...,2] \
+          for k in _calibration_sample_observation_keys \
+          if optimization_inputs.get(k) is not None }
+    return solved, b_packed
+
+
+def _calibration_sample_apply(optimization_inputs_sampled, isample,
+                              solved, function_optimize):
+    r'''Apply the result of _calibration_sample_optimize()
+
+If the solve happened in this process, this is a no-op
+
+    '''
+
+    if function_optimize is not None:
+        optimization_inputs_sampled[isample] = solved
+        return
+
+    optimization_inputs = optimization_inputs_sampled[isample]
+    optimization_inputs.update(solved['state'])
+    for k,w in solved['weights'].items():
+        optimization_inputs[k][...,2] = w
+
+
+def _calibration_sample_worker_init(optimization_inputs_sampled,
+                                    function_optimize):
+    r'''Initializer for the calibration_sample() worker processes
+
+The workers are fork()ed, so the perturbed optimization_inputs are inherited,
+not pickled. Each worker keeps them for the duration of the pool, so only the
+sample index is sent to the workers, and only what the solve changed comes back
+
+    '''
+
+    _calibration_sample_worker.optimization_inputs_sampled = optimization_inputs_sampled
+    _calibration_sample_worker.function_optimize           = function_optimize
+
+
+def _calibration_sample_worker(isample):
+    return \
+        _calibration_sample_optimize(_calibration_sample_worker.optimization_inputs_sampled[isample],
+                                     _calibration_sample_worker.function_optimize)
+
+
 def calibration_sample(Nsamples,
                        optimization_inputs_baseline,
                        pixel_uncertainty_stdev,
                        fixedframes,
-                       function_optimize = None):
+                       function_optimize = None,
+                       Nprocesses        = 1,
+                       rng               = None):
 
     r'''Sample calibrations subject to random noise on the input observations
 
@@ -639,6 +768,16 @@ optimization_inputs_baseline['observations_board'] and
 optimization_inputs_baseline['observations_point'] are assumed to contain
 perfect observations
 
+The noise is generated sequentially in this process, so the results are
+deterministic. The solves are independent. By default they all happen in this
+process. If Nprocesses > 1, they're farmed out to that many fork()ed worker
+processes instead. Each solve may itself use multiple threads, so the caller
+should pick Nprocesses with that in mind. A custom function_optimize must be
+safe to call in a fork()ed child if Nprocesses > 1
+
+The noise comes from the global numpy RNG, unless a numpy.random.Generator is
+passed in "rng"
+
     '''
 
     def have(k):
@@ -679,46 +818,70 @@ perfect observations
         Ncameras_extrinsics += 1
     extrinsics_sampled_mounted = np.zeros((Nsamples,Ncameras_extrinsics,6), dtype=float)
 
+    # The observations are replaced with perturbed copies below, so I don't
+    # deep-copy the baseline observations only to throw them away
+    keys_observations = [k for k in ('observations_board','observations_point') \
+                         if have(k)]
+
+    # I perturb all the samples up-front, in order. This uses the RNG in exactly
+    # the same way as a sequential loop would
     for isample in range(Nsamples):
-        if (isample+1) % 20 == 0:
-            print(f"Sampling {isample+1}/{Nsamples}")
 
-        optimization_inputs_sampled[isample] = copy.deepcopy(optimization_inputs_baseline)
+        optimization_inputs_sampled[isample] = \
+            copy.deepcopy({ k: (None if k in keys_observations else v) \
+                            for k,v in optimization_inputs_baseline.items() })
         optimization_inputs = optimization_inputs_sampled[isample]
 
+        # The noise is written directly into the q_noise_..._sampled arrays
         if have('observations_board'):
-            q_noise_board_sampled[isample],optimization_inputs['observations_board'] = \
-                sample_dqref(optimization_inputs['observations_board'],
-                             pixel_uncertainty_stdev)
-        else:
-            q_noise_board = None
+            _,optimization_inputs['observations_board'] = \
+                sample_dqref(optimization_inputs_baseline['observations_board'],
+                             pixel_uncertainty_stdev,
+                             rng = rng,
+                             out = q_noise_board_sampled[isample])
         if have('observations_point'):
-            q_noise_point_sampled[isample],optimization_inputs['observations_point'] = \
-                sample_dqref(optimization_inputs['observations_point'],
-                             pixel_uncertainty_stdev)
-        else:
-            q_noise_point = None
-
-        if function_optimize is None:
-            b_sampled_unpacked[isample] = mrcal.optimize(**optimization_inputs)['b_packed']
-            mrcal.unpack_state(b_sampled_unpacked[isample], **optimization_inputs)
-        else:
-            function_optimize(optimization_inputs)
-
-        intrinsics_sampled    [isample,...] = optimization_inputs['intrinsics']
-        if fixedframes:
-            extrinsics_sampled_mounted[isample,   ...] = optimization_inputs['extrinsics_rt_fromref']
-        else:
-            # the remaining row is already 0
-            extrinsics_sampled_mounted[isample,1:,...] = optimization_inputs['extrinsics_rt_fromref']
-
-        if frames_sampled is not None:
-            frames_sampled[isample,...] = optimization_inputs['frames_rt_toref']
-        if points_sampled is not None:
-            points_sampled[isample,...] = optimization_inputs['points']
-        if calobject_warp_sampled is not None:
-            calobject_warp_sampled[isample,...] = optimization_inputs['calobject_warp']
-
+            _,optimization_inputs['observations_point'] = \
+                sample_dqref(optimization_inputs_baseline['observations_point'],
+                             pixel_uncertainty_stdev,
+                             rng = rng,
+                             out = q_noise_point_sampled[isample])
+
+    def gather(results):
+        for isample,(solved,b_packed) in enumerate(results):
+            if (isample+1) % 20 == 0:
+                print(f"Sampling {isample+1}/{Nsamples}")
+
+            _calibration_sample_apply(optimization_inputs_sampled, isample,
+                                      solved, function_optimize)
+            optimization_inputs = optimization_inputs_sampled[isample]
+
+            if b_sampled_unpacked is not None:
+                b_sampled_unpacked[isample] = b_packed
+
+            intrinsics_sampled    [isample,...] = optimization_inputs['intrinsics']
+            if fixedframes:
+                extrinsics_sampled_mounted[isample,   ...] = optimization_inputs['extrinsics_rt_fromref']
+            else:
+                # the remaining row is already 0
+                extrinsics_sampled_mounted[isample,1:,...] = optimization_inputs['extrinsics_rt_fromref']
+
+            if frames_sampled is not None:
+                frames_sampled[isample,...] = optimization_inputs['frames_rt_toref']
+            if points_sampled is not None:
+                points_sampled[isample,...] = optimization_inputs['points']
+            if calobject_warp_sampled is not None:
+                calobject_warp_sampled[isample,...] = optimization_inputs['calobject_warp']
+
+    if Nprocesses <= 1:
+        gather( _calibration_sample_optimize(optimization_inputs_sampled[isample],
+                                             function_optimize) \
+                for isample in range(Nsamples) )
+    else:
+        with multiprocessing.get_context('fork').Pool(Nprocesses,
+                                                      initializer = _calibration_sample_worker_init,
+                                                      initargs    = (optimization_inputs_sampled,
+                                                                     function_optimize)) as pool:
+            gather( pool.imap(_calibration_sample_worker, range(Nsamples)) )
 
     return (intrinsics_sampled,
             extrinsics_sampled_mounted,
@@ -192,6 +192,18 @@ def confirm_equal(x, xref,
             return False
 
     if N != 0:
+
+        # Identical numerical arrays pass any tolerance, so I can skip computing
+        # the error. Unless I have NaN or Inf: those must fail below
+        if isinstance(x,    np.ndarray) and \
+           isinstance(xref, np.ndarray) and \
+           x.dtype == xref.dtype        and \
+           x.dtype.kind in 'biuf'       and \
+           np.array_equal(x, xref)      and \
+           (x.dtype.kind != 'f' or np.all(np.isfinite(x))):
+            print_green("OK" + (': ' + msg) if msg else '')
+            return True
+
         try:  # I I can subtract, get the error that way
             if relative:
                 diff = relative_diff(x, xref,
@@ -305,8 +317,11 @@ def confirm_covariances_equal(var, var_ref,
                   msg = f"Var(dq) is symmetric for {what}")
 
 
-    l_predicted,v_predicted = mrcal.sorted_eig(var)
-    l_observed, v_observed  = mrcal.sorted_eig(var_ref)
+    # Covariances are symmetric, so I use eigh() instead of the general
+    # mrcal.sorted_eig(). It's faster, and it returns real eigenvalues already
+    # sorted in ascending order
+    l_predicted,v_predicted = np.linalg.eigh(var)
+    l_observed, v_observed  = np.linalg.eigh(var_ref)
 
     eccentricity_threshold = 2.
 